@@ -1,10 +1,19 @@
 from dataclasses import dataclass, field
 from itertools import count
 
-fresh = count(1).__next__
+_ids = count(1)
 
 
-@dataclass(frozen=True)
+def fresh():
+    return next(_ids)
+
+
+def fresh_from(start: int):
+    global _ids
+    _ids = count(max(start, fresh()) + 1)
+
+
+@dataclass(frozen=True, slots=True)
 class Name:
     text: str
     id: int = field(default_factory=fresh)
@@ -16,7 +25,7 @@ class Name:
         return self.text == "_"
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Param[T]:
     name: Name
     type: T
@@ -28,12 +37,12 @@ class Param[T]:
         return f"{l}{self.name}: {self.type}{r}"
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Decl:
     loc: int
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Def[T](Decl):
     name: Name
     params: list[Param[T]]
@@ -41,21 +50,21 @@ class Def[T](Decl):
     body: T
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Sig[T](Decl):
     name: Name
     params: list[Param[T]]
     ret: T
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Example[T](Decl):
     params: list[Param[T]]
     ret: T
     body: T
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Ctor[T](Decl):
     name: Name
     params: list[Param[T]]
@@ -63,29 +72,30 @@ class Ctor[T](Decl):
     ty_name: Name | None = None
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Data[T](Decl):
     name: Name
     params: list[Param[T]]
     ctors: list[Ctor[T]]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Field[T](Decl):
     name: Name
     type: T
     cls_name: Name | None = None
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Class[T](Decl):
     name: Name
     params: list[Param[T]]
     fields: list[Field[T]]
     instances: list[int] = field(default_factory=list)
+    index: dict[tuple[int, object], set[int]] = field(default_factory=dict)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Instance[T](Decl):
     type: T
     fields: list[tuple[T, T]]
@@ -1,71 +1,102 @@
+import json
 import sys
+import time
+import traceback
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from functools import partial
 from pathlib import Path
+from typing import Optional
 
-from pyparsing import util, exceptions
-
-from . import ast, ir
+from .cache import VERSION
+from .diagnostics import Diagnostic, check_file
 
 
 fatal = lambda m: sys.exit(int(not print(m)))
 
+SUFFIXES = (".lean", ".md")
+
+
+def timed(file: Path, cached=False):
+    start = time.perf_counter()
+    try:
+        ds = check_file(file, cached)
+    except RecursionError:
+        m = f"{file}: program too complex or oops you just got '⊥'!"
+        ds = [Diagnostic(str(file), m)]
+    except Exception:
+        m = f"{file}: internal compiler error!\n{traceback.format_exc()}"
+        ds = [Diagnostic(str(file), m)]
+    return file, ds, time.perf_counter() - start
+
+
+def files_of(paths: list[Path]):
+    for p in paths:
+        if p.is_dir():
+            yield from sorted(f for f in p.rglob("*") if f.suffix in SUFFIXES)
+        else:
+            yield p
+
+
+def dump(ds: list[Diagnostic]):
+    print(json.dumps([asdict(d) for d in ds], ensure_ascii=False, indent=2))
+
+
+def batch(files: list[Path], jobs: Optional[int], cached=False, as_json=False):
+    start = time.perf_counter()
+    failed, found = 0, []
+    with ProcessPoolExecutor(jobs) as pool:
+        for file, ds, t in pool.map(partial(timed, cached=cached), files, chunksize=8):
+            failed += bool(ds)
+            found.extend(ds)
+            if as_json:
+                continue
+            for d in ds:
+                print(d)
+            print(f"{t:8.3f}s  {'FAIL' if ds else 'ok':4}  {file}")
+    total = time.perf_counter() - start
+    if as_json:
+        dump(found)
+    else:
+        print(f"{len(files)} files, {failed} failed in {total:.3f}s")
+    return failed
+
 
-_F = Path(sys.argv[1]) if len(sys.argv) > 1 else None
+def main(argv: Optional[list[str]] = None):
+    p = ArgumentParser(prog="tinylean")
+    p.add_argument("paths", metavar="FILE", nargs="*", type=Path)
+    p.add_argument("-j", "--jobs", type=int, default=None)
+    p.add_argument("--serve", metavar="SOCKET")
+    p.add_argument("--cache", action="store_true")
+    p.add_argument("--json", action="store_true")
+    p.add_argument("--version", action="version", version=f"%(prog)s {VERSION}")
+    args = p.parse_args(argv)
 
+    if args.serve:
+        from .server import serve
 
-def fatal_on(text: str, loc: int, m: str):
-    fatal(f"{_F}:{util.lineno(loc, text)}:{util.col(loc, text)}: {m}")
+        return serve(args.serve)
+    if not args.paths:
+        fatal("usage: tinylean FILE...")
 
+    files = list(files_of(args.paths))
+    if len(files) != 1 or args.paths[0].is_dir():
+        sys.exit(int(batch(files, args.jobs, args.cache, args.json) > 0))
 
-def main(file=_F if _F else fatal("usage: tinylean FILE")):
     try:
-        with open(file, encoding="utf-8") as f:
-            text = f.read()
-            ast.check_string(text, file.suffix == ".md")
-    except OSError as e:
-        fatal(e)
-    except exceptions.ParseException as e:
-        fatal_on(text, e.loc, str(e).split("(at char")[0].strip())
-    except ast.UndefinedVariableError as e:
-        v, loc = e.args
-        fatal_on(text, loc, f"undefined variable '{v}'")
-    except ast.DuplicateVariableError as e:
-        v, loc = e.args
-        fatal_on(text, loc, f"duplicate variable '{v}'")
-    except ast.TypeMismatchError as e:
-        want, got, loc = e.args
-        fatal_on(text, loc, f"type mismatch:\nwant:\n  {want}\n\ngot:\n  {got}")
-    except ast.UnsolvedPlaceholderError as e:
-        name, ctx, ty, loc = e.args
-        ty_msg = f"  {name} : {ty}"
-        ctx_msg = "".join([f"\n  {p}" for p in ctx.values()]) if ctx else " (none)"
-        fatal_on(text, loc, f"unsolved placeholder:\n{ty_msg}\n\ncontext:{ctx_msg}")
-    except ast.UnknownCaseError as e:
-        want, got, loc = e.args
-        fatal_on(text, loc, f"cannot match case '{got}' of type '{want}'")
-    except ast.DuplicateCaseError as e:
-        name, loc = e.args
-        fatal_on(text, loc, f"duplicate case '{name}'")
-    except ast.CaseParamMismatchError as e:
-        want, got, loc = e.args
-        fatal_on(text, loc, f"want '{want}' case parameters, but got '{got}'")
-    except ast.CaseMissError as e:
-        miss, loc = e.args
-        fatal_on(text, loc, f"missing case: {miss}")
-    except ast.FieldMissError as e:
-        miss, loc = e.args
-        fatal_on(text, loc, f"missing field: {miss}")
-    except ast.UnknownFieldError as e:
-        want, got, loc = e.args
-        fatal_on(text, loc, f"unknown field '{got}' of class '{want}'")
-    except ir.NoInstanceError as e:
-        name, loc = e.args
-        fatal_on(text, loc, f"no such instance for class '{name}'")
+        ds = check_file(files[0], args.cache)
     except RecursionError as e:
         print("Program too complex or oops you just got '⊥'! Please report this issue:")
         raise e
     except Exception as e:
         print("Internal compiler error! Please report this issue:")
         raise e
+    if args.json:
+        dump(ds)
+        sys.exit(int(bool(ds)))
+    if ds:
+        fatal("\n\n".join(map(str, ds)))
 
 
 if __name__ == "__main__":
@@ -1,17 +1,19 @@
-from functools import reduce
-from itertools import chain
-from dataclasses import dataclass, field
-from typing import OrderedDict, cast as _c
-
-from pyparsing import ParseResults
+import re
+from concurrent.futures import ProcessPoolExecutor
+from functools import cache, reduce
+from itertools import chain, islice, takewhile
+from dataclasses import dataclass, field, replace
+from typing import Iterable, Iterator, OrderedDict, cast as _c
 
 from . import (
     Name,
     Param,
     Decl,
     ir,
-    grammar as _g,
+    db,
+    nbe,
     fresh,
+    fresh_from,
     Def,
     Example,
     Ctor,
@@ -23,119 +25,187 @@ from . import (
 )
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Node:
     loc: int
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Type(Node): ...
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Ref(Node):
     name: Name
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class FnType(Node):
     param: Param[Node]
     ret: Node
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Fn(Node):
     param: Name
     body: Node
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Call(Node):
     callee: Node
     arg: Node
     implicit: str | bool
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Placeholder(Node):
     is_user: bool
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
+class Lit(Node):
+    value: int
+
+
+@dataclass(frozen=True, slots=True)
 class Nomatch(Node):
     arg: Node
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Case(Node):
     ctor: Ref
     params: list[Name]
     body: Node
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Match(Node):
     arg: Node
     cases: list[Case]
 
 
-_g.name.add_parse_action(lambda r: Name(r[0][0]))
-
 _ops = {"+": "add", "-": "sub", "*": "mul", "/": "div"}
 
 
-def _infix(loc: int, ret: ParseResults):
-    r = ret[0]
-    if not isinstance(r, ParseResults):
+def _infix(loc: int, ret):
+    return _fold(loc, ret[0])
+
+
+def _fold(loc: int, r) -> Node:
+    if isinstance(r, Node):
         return r
-    return Call(loc, Call(loc, Ref(loc, Name(_ops[r[1]])), r[0], False), r[2], False)
-
-
-_g.expr.add_parse_action(_infix)
-_g.type_.add_parse_action(lambda l, r: Type(l))
-_g.ph.add_parse_action(lambda l, r: Placeholder(l, True))
-_g.ref.add_parse_action(lambda l, r: Ref(l, r[0][0]))
-_g.i_param.add_parse_action(lambda r: Param(r[0], r[1], True))
-_g.e_param.add_parse_action(lambda r: Param(r[0], r[1], False))
-_g.c_param.add_parse_action(lambda r: Param(r[0], r[1], True, True))
-_g.fn_type.add_parse_action(lambda l, r: FnType(l, r[0], r[1]))
-_g.fn.add_parse_action(
-    lambda l, r: reduce(lambda a, n: Fn(l, n, a), reversed(r[0]), r[1])
-)
-_g.match.add_parse_action(lambda l, r: Match(l, r[0], list(r[1])))
-_g.case.add_parse_action(lambda r: Case(r[0].loc, r[0], r[1], r[2]))
-_g.nomatch.add_parse_action(lambda l, r: Nomatch(l, r[0][0]))
-_g.i_arg.add_parse_action(lambda l, r: (r[1], r[0]))
-_g.e_arg.add_parse_action(lambda l, r: (r[0], False))
-_g.call.add_parse_action(
-    lambda l, r: reduce(lambda a, b: Call(l, a, b[0], b[1]), r[1:], r[0])
-)
-_g.p_expr.add_parse_action(lambda r: r[0])
-
-_g.return_type.add_parse_action(lambda l, r: r[0] if len(r) else Placeholder(l, False))
-_g.def_.add_parse_action(lambda r: Def(r[0].loc, r[0].name, list(r[1]), r[2], r[3]))
-_g.example.add_parse_action(lambda l, r: Example(l, list(r[0]), r[1], r[2]))
-_g.type_arg.add_parse_action(lambda r: (r[0], r[1]))
-_g.ctor.add_parse_action(lambda r: Ctor(r[0].loc, r[0].name, list(r[1]), list(r[2])))
-_g.data.add_condition(
-    lambda r: r[0].name.text == r[3], message="open and datatype name mismatch"
-).add_parse_action(lambda r: Data(r[0].loc, r[0].name, list(r[1]), list(r[2])))
-_g.c_field.add_parse_action(lambda l, r: Field(l, r[0], r[1]))
-_g.class_.add_condition(
-    lambda r: r[0].name.text == r[3], message="open and class name mismatch"
-).add_parse_action(lambda r: Class(r[0].loc, r[0].name, list(r[1]), list(r[2])))
-_g.i_field.add_parse_action(lambda r: (r[0], r[1]))
-_g.inst.add_parse_action(lambda l, r: Instance(l, r[0], list(r[1])))
+    ret = _fold(loc, r[0])
+    for op, x in zip(r[1::2], r[2::2]):
+        f = Call(loc, Ref(loc, Name(_ops[op])), ret, False)
+        ret = Call(loc, f, _fold(_leftmost(x), x), False)
+    return ret
+
+
+def _leftmost(r) -> int:
+    while not isinstance(r, Node):
+        r = r[0]
+    return r.loc
+
+
+@cache
+def grammar():
+    from . import grammar as g
+
+    g.name.add_parse_action(lambda r: Name(r[0][0]))
+    g.expr.add_parse_action(_infix)
+    g.type_.add_parse_action(lambda l, r: Type(l))
+    g.ph.add_parse_action(lambda l, r: Placeholder(l, True))
+    g.num.add_parse_action(lambda l, r: Lit(l, int(r[0])))
+    g.ref.add_parse_action(lambda l, r: Ref(l, r[0][0]))
+    g.i_param.add_parse_action(lambda r: Param(r[0], r[1], True))
+    g.e_param.add_parse_action(lambda r: Param(r[0], r[1], False))
+    g.c_param.add_parse_action(lambda r: Param(r[0], r[1], True, True))
+    g.fn_type.add_parse_action(lambda l, r: FnType(l, r[0], r[1]))
+    g.fn.add_parse_action(
+        lambda l, r: reduce(lambda a, n: Fn(l, n, a), reversed(r[0]), r[1])
+    )
+    g.match.add_parse_action(lambda l, r: Match(l, r[0], list(r[1])))
+    g.case.add_parse_action(lambda r: Case(r[0].loc, r[0], list(r[1]), r[2]))
+    g.nomatch.add_parse_action(lambda l, r: Nomatch(l, r[0][0]))
+    g.i_arg.add_parse_action(lambda l, r: (r[1], r[0]))
+    g.e_arg.add_parse_action(lambda l, r: (r[0], False))
+    g.call.add_parse_action(
+        lambda l, r: reduce(lambda a, b: Call(l, a, b[0], b[1]), r[1:], r[0])
+    )
+    g.p_expr.add_parse_action(lambda r: r[0])
+
+    g.return_type.add_parse_action(
+        lambda l, r: r[0] if len(r) else Placeholder(l, False)
+    )
+    g.def_.add_parse_action(lambda r: Def(r[0].loc, r[0].name, list(r[1]), r[2], r[3]))
+    g.example.add_parse_action(lambda l, r: Example(l, list(r[0]), r[1], r[2]))
+    g.type_arg.add_parse_action(lambda r: (r[0], r[1]))
+    g.ctor.add_parse_action(lambda r: Ctor(r[0].loc, r[0].name, list(r[1]), list(r[2])))
+    g.data.add_condition(
+        lambda r: r[0].name.text == r[3], message="open and datatype name mismatch"
+    ).add_parse_action(lambda r: Data(r[0].loc, r[0].name, list(r[1]), list(r[2])))
+    g.c_field.add_parse_action(lambda l, r: Field(l, r[0], r[1]))
+    g.class_.add_condition(
+        lambda r: r[0].name.text == r[3], message="open and class name mismatch"
+    ).add_parse_action(lambda r: Class(r[0].loc, r[0].name, list(r[1]), list(r[2])))
+    g.i_field.add_parse_action(lambda r: (r[0], r[1]))
+    g.inst.add_parse_action(lambda l, r: Instance(l, r[0], list(r[1])))
+    return g
 
 
 @dataclass(frozen=True)
 class Parser:
     is_markdown: bool = False
+    backend: str = "pyparsing"
 
     def __ror__(self, s: str):
+        if self.backend == "pratt":
+            from . import pratt
+
+            return pratt.parse(s, self.is_markdown)
         if not self.is_markdown:
-            return list(_g.program.parse_string(s, parse_all=True))
-        return chain.from_iterable(r[0] for r in _g.markdown.scan_string(s))
+            return list(grammar().program.parse_string(s, parse_all=True))
+        return chain.from_iterable(_block(grammar().program, s, *b) for b in blocks(s))
+
+    def stream(self, s: str) -> Iterator[Decl]:
+        if self.backend == "pratt":
+            from . import pratt
+
+            return (d for _, d, _ in pratt.located(s, self.is_markdown))
+        return iter(s | self)
+
+    def located(self, s: str) -> list[tuple[int, Decl, int]]:
+        if self.backend == "pratt":
+            from . import pratt
+
+            return list(pratt.located(s, self.is_markdown))
+        if not self.is_markdown:
+            rs = grammar().located.parse_string(s, parse_all=True)
+        else:
+            rs = chain.from_iterable(
+                _block(grammar().located, s, *b) for b in blocks(s)
+            )
+        return [(start, r[0], end) for start, r, end in rs]
+
+
+_FENCE = re.compile(r"^```lean[ \t]*\r?\n", re.M)
+_CLOSE = re.compile(r"^```[ \t]*\r?$", re.M)
+
+
+def blocks(s: str) -> Iterator[tuple[int, int]]:
+    pos = 0
+    while m := _FENCE.search(s, pos):
+        if not (c := _CLOSE.search(s, m.end())):
+            return
+        yield m.end(), c.start()
+        pos = c.end()
+
+
+def _block(g, s: str, start: int, end: int):
+    g = (grammar().GoTo(start) + g).parse_with_tabs()
+    return g.parse_string(s[:end], parse_all=True)
 
 
 class DuplicateVariableError(Exception): ...
@@ -152,6 +222,9 @@ class NameResolver:
     def __ror__(self, decls: list[Decl]):
         return [self._decl(d) for d in decls]
 
+    def stream(self, decls: Iterable[Decl]) -> Iterator[Decl]:
+        return (self._decl(d) for d in decls)
+
     def _decl(self, decl: Decl) -> Decl:
         self.locals.clear()
 
@@ -242,7 +315,7 @@ class NameResolver:
                 body = self._with_locals(c.body, *c.params)
                 cases.append(Case(c.loc, ctor, c.params, body))
             return Match(n.loc, arg, cases)
-        assert isinstance(n, Type) or isinstance(n, Placeholder)
+        assert any(isinstance(n, c) for c in (Type, Placeholder, Lit))
         return n
 
     def _with_locals(self, node: Node, *names: Name):
@@ -299,17 +372,80 @@ class TypeChecker:
     locals: dict[int, Param[ir.IR]] = field(default_factory=dict)
     holes: OrderedDict[int, ir.Hole] = field(default_factory=OrderedDict)
     recur_ids: set[int] = field(default_factory=set)
+    nbe: bool = False
+    interner: ir.Interner = field(default_factory=ir.Interner)
+    decls: db.Cache = field(default_factory=db.Cache)
+    instances: ir.InstanceCache = field(default_factory=ir.InstanceCache)
+    jobs: int = 1
 
     def __ror__(self, ds: list[Decl]):
+        if self.jobs > 1:
+            return self._parallel(ds)
         ret = [self._run(d) for d in ds]
-        for i, h in self.holes.items():
+        self._check_holes()
+        return ret
+
+    def stream(self, ds: Iterable[Decl]) -> Iterator[Decl]:
+        for d in ds:
+            yield self._run(d)
+        self._check_holes()
+
+    def _parallel(self, ds: list[Decl]):
+        leaves = _leaves(ds, dependencies(ds))
+        shared: dict[int, Decl | Exception] = {}
+        marks: dict[int, int] = {}
+        for i, d in enumerate(ds):
+            if i in leaves:
+                continue
+            marks[i] = len(self.holes)
+            try:
+                shared[i] = self._run(d)
+            except Exception as e:
+                shared[i] = e
+                leaves = {j for j in leaves if j < i}
+                break
+        base = fresh()
+        with ProcessPoolExecutor(
+            min(self.jobs, len(leaves) or 1),
+            initializer=_init_worker,
+            initargs=(self.globals, self.holes, self.nbe),
+        ) as pool:
+            checked = {
+                i: pool.submit(_check_leaf, ds[i], base + k * _LEAF_IDS)
+                for k, i in enumerate(sorted(leaves))
+            }
+            ret, unsolved = [], {}
+            for i in sorted(chain(shared, leaves)):
+                if i in shared:
+                    v = shared[i]
+                    if isinstance(v, Exception):
+                        raise v
+                    ret.append(v)
+                    continue
+                v, e = checked[i].result()
+                ret.append(v)
+                if e:
+                    unsolved[i] = e
+        fresh_from(base + len(leaves) * _LEAF_IDS)
+        bounds = [*marks.values(), len(self.holes)]
+        for (i, start), stop in zip(marks.items(), bounds[1:]):
+            try:
+                self._check_holes(start, stop)
+            except UnsolvedPlaceholderError as e:
+                unsolved[i] = e
+                break
+        if unsolved:
+            raise unsolved[min(unsolved)]
+        return ret
+
+    def _check_holes(self, start=0, stop=None):
+        for i, h in islice(self.holes.items(), start, stop):
             if h.answer.is_unsolved():
                 ty = self._inliner().run(h.answer.type)
                 if _is_solved_class(ty):
                     continue
                 p = ir.Placeholder(i, h.is_user)
                 raise UnsolvedPlaceholderError(str(p), h.locals, ty, h.loc)
-        return ret
 
     def _run(self, decl: Decl) -> Decl:
         self.locals.clear()
@@ -322,12 +458,13 @@ class TypeChecker:
         return self._class(_c(Class, decl))
 
     def _def_or_example(self, d: Def[Node] | Example[Node]):
-        params = self._params(d.params)
-        ret = self.check(d.ret, ir.Type())
+        params = self._params(d.params, isinstance(d, Def))
+        ret = self._zonk(self.check(d.ret, ir.Type()))
 
         if isinstance(d, Def):
+            ret = self.interner.run(ret)
             self.globals[d.name.id] = Sig(d.loc, d.name, params, ret)
-        body = self.check(d.body, ret)
+        body = self._inliner().run(self.check(d.body, ret))
 
         if isinstance(d, Example):
             return Example(d.loc, params, ret, body)
@@ -366,9 +503,9 @@ class TypeChecker:
         return cls
 
     def _inst(self, i: Instance[Node]):
-        ty = self.check(i.type, ir.Type())
+        ty = self._whnf(self.check(i.type, ir.Type()))
         if not isinstance(ty, ir.Class):
-            raise TypeMismatchError("class", str(ty), i.type.loc)
+            raise TypeMismatchError("class", self._show(ty), i.type.loc)
         c = _c(Class, self.globals[ty.name.id])
         vals = {_c(Ref, n).name.id: (n, f) for n, f in i.fields}
         fields = []
@@ -377,31 +514,34 @@ class TypeChecker:
             if not nv:
                 raise FieldMissError(f.name.text, i.loc)
             f_decl = _c(Field, self.globals[f.name.id])
-            field_ty = ir.from_field(f_decl, c, False)[1]
+            field_ty = self.decls.get(ir.from_field, f_decl, c, False)[1]
             env = []
             for ty_arg in ty.args:
                 assert isinstance(field_ty, ir.FnType)
                 env.append((field_ty.param.name, ty_arg))
                 field_ty = field_ty.ret
-            f_type = self._inliner().run_with(field_ty, *env)
+            f_type = self._inliner(False).run_with(field_ty, *env)
             fields.append((ir.Ref(f.name), self.check(nv[1], f_type)))
         for n, _ in vals.values():
             assert isinstance(n, Ref)
             raise UnknownFieldError(c.name.text, n.name.text, n.loc)
-        c.instances.append(i.id)
         inst = Instance(i.loc, _c(ir.IR, ty), fields, i.id)
+        ir.add_instance(c, inst)
         self.globals[i.id] = inst
         return inst
 
-    def _params(self, params: list[Param[Node]]):
+    def _params(self, params: list[Param[Node]], intern=True):
         ret = []
         for p in params:
             t = self.check(p.type, ir.Type())
             if p.is_class:
-                t = self._inliner().run(t)
+                t = self._whnf(t)
                 assert p.is_implicit
                 if not isinstance(t, ir.Class):
-                    raise TypeMismatchError("class", str(t), p.type.loc)
+                    raise TypeMismatchError("class", self._show(t), p.type.loc)
+            t = self._zonk(t)
+            if intern:
+                t = self.interner.run(t)
             param = Param(p.name, t, p.is_implicit, p.is_class)
             self.locals[p.name.id] = param
             ret.append(param)
@@ -409,17 +549,21 @@ class TypeChecker:
 
     def check(self, n: Node, typ: ir.IR) -> ir.IR:
         if isinstance(n, Fn):
-            t = self._inliner().run(typ)
+            t = self._whnf(typ)
             if not isinstance(t, ir.FnType):
-                raise TypeMismatchError(str(t), "function", n.loc)
-            ret = self._inliner().run_with(t.ret, (t.param.name, ir.Ref(n.param)))
+                raise TypeMismatchError(self._show(t), "function", n.loc)
+            ret = self._inliner(False).run_with(t.ret, (t.param.name, ir.Ref(n.param)))
             p = Param(n.param, t.param.type, t.param.is_implicit, t.param.is_class)
             return ir.Fn(p, self._check_with(n.body, ret, p))
+        if isinstance(n, Lit):
+            t = self._whnf(typ)
+            if isinstance(t, ir.Data) and (nat := ir.nat_ctors(self.globals, t.name)):
+                return ir.Lit(t.name, *nat, n.value)
+            raise TypeMismatchError(self._show(t), "natural number", n.loc)
 
         holes_len = len(self.holes)
         val, got = self.infer(n)
-        got = self._inliner().run(got)
-        want = self._inliner().run(typ)
+        got, want = self._whnf(got), self._whnf(typ)
 
         if _can_insert_placeholders(want):
             holes_len = len(self.holes)
@@ -428,7 +572,7 @@ class TypeChecker:
                 val, got = self.infer(new_f)
 
         if not self._eq(got, want):
-            raise TypeMismatchError(str(want), str(got), n.loc)
+            raise TypeMismatchError(self._show(want), self._show(got), n.loc)
 
         return val
 
@@ -438,59 +582,73 @@ class TypeChecker:
                 return ir.Ref(param.name), param.type
             d = self.globals[n.name.id]
             if isinstance(d, Def):
-                return ir.from_def(d)
+                return ir.Recur(d.name), self.decls.get(ir.from_def, d)[1]
             if isinstance(d, Sig):
                 self.recur_ids.add(d.name.id)
-                return ir.from_sig(d)
+                return self.decls.get(ir.from_sig, d)
             if isinstance(d, Data):
-                return ir.from_data(d)
+                return self.decls.get(ir.from_data, d)
             if isinstance(d, Ctor):
-                _, v, ty = ir.from_ctor(d, _c(Data, self.globals[d.ty_name.id]))
+                data = _c(Data, self.globals[d.ty_name.id])
+                _, v, ty = self.decls.get(ir.from_ctor, d, data)
                 return v, ty
             if isinstance(d, Field):
-                return ir.from_field(d, _c(Class, self.globals[d.cls_name.id]))
-            return ir.from_class(_c(Class, d))
+                c = _c(Class, self.globals[d.cls_name.id])
+                return self.decls.get(ir.from_field, d, c)
+            return self.decls.get(ir.from_class, _c(Class, d))
         if isinstance(n, FnType):
             p_typ = self.check(n.param.type, ir.Type())
             p = Param(n.param.name, p_typ, n.param.is_implicit, n.param.is_class)
             b_val = self._check_with(n.ret, ir.Type(), p)
             return ir.FnType(p, b_val), ir.Type()
         if isinstance(n, Call):
-            holes_len = len(self.holes)
-            f_val, got = self.infer(n.callee)
-
-            if implicit_f := _with_placeholders(n.callee, got, n.implicit):
-                [self.holes.popitem() for _ in range(len(self.holes) - holes_len)]
-                return self.infer(Call(n.loc, implicit_f, n.arg, n.implicit))
-
-            if not isinstance(got, ir.FnType):
-                raise TypeMismatchError("function", str(got), n.callee.loc)
-
-            x_tm = self._check_with(n.arg, got.param.type, got.param)
-            typ = self._inliner().run_with(got.ret, (got.param.name, x_tm))
-            val = self._inliner().apply(f_val, x_tm)
-            return val, typ
+            f_val, xs, typ = self._infer_call(n)
+            return self._inliner(False).apply(f_val, *xs), typ
         if isinstance(n, Placeholder):
             ty = self._insert_hole(n.loc, n.is_user, ir.Type())
             v = self._insert_hole(n.loc, n.is_user, ty)
             return v, ty
         if isinstance(n, Nomatch):
-            _, got = self.infer(n.arg)
+            got = self._whnf(self.infer(n.arg)[1])
             if not isinstance(got, ir.Data):
-                raise TypeMismatchError("datatype", str(got), n.arg.loc)
+                raise TypeMismatchError("datatype", self._show(got), n.arg.loc)
             data = _c(Data, self.globals[got.name.id])
             for c in data.ctors:
                 self._exhaust(n.arg.loc, c, data, got)
             return ir.Nomatch(), self._insert_hole(n.loc, False, ir.Type())
         if isinstance(n, Match):
             return self._infer_match(n)
+        if isinstance(n, Lit):
+            raise TypeMismatchError("natural number type", str(n.value), n.loc)
         assert isinstance(n, Type)
         return ir.Type(), ir.Type()
 
+    def _infer_call(self, n: Call) -> tuple[ir.IR, list[ir.IR], ir.IR]:
+        holes_len = len(self.holes)
+        if isinstance(n.callee, Call):
+            f_val, xs, got = self._infer_call(n.callee)
+        else:
+            (f_val, got), xs = self.infer(n.callee), []
+        got = self._whnf(got)
+
+        if implicit_f := _with_placeholders(n.callee, got, n.implicit):
+            [self.holes.popitem() for _ in range(len(self.holes) - holes_len)]
+            return self._infer_call(Call(n.loc, implicit_f, n.arg, n.implicit))
+
+        if not isinstance(got, ir.FnType):
+            raise TypeMismatchError("function", self._show(got), n.callee.loc)
+        if got.param.is_class:
+            self._instance(got.param.type)
+
+        x_tm = self._check_with(n.arg, got.param.type, got.param)
+        typ = self._inliner(False).run_with(got.ret, (got.param.name, x_tm))
+        return f_val, [*xs, x_tm], typ
+
     def _infer_match(self, n: Match):
         arg, arg_ty = self.infer(n.arg)
+        arg_ty = self._whnf(arg_ty)
         if not isinstance(arg_ty, ir.Data):
-            raise TypeMismatchError("datatype", str(arg_ty), n.arg.loc)
+            raise TypeMismatchError("datatype", self._show(arg_ty), n.arg.loc)
         data = _c(Data, self.globals[arg_ty.name.id])
         ctors = {c.name.id: c for c in data.ctors}
         ty: ir.IR | None = None
@@ -503,7 +661,7 @@ class TypeChecker:
                 raise DuplicateCaseError(ctor.name.text, c.loc)
             c_params, c_ty = self._case_params(c.loc, ctor, data)
             if not self._eq(c_ty, arg_ty):
-                raise TypeMismatchError(str(arg_ty), str(c_ty), c.loc)
+                raise TypeMismatchError(self._show(arg_ty), self._show(c_ty), c.loc)
             if len(c.params) != len(c_params):
                 raise CaseParamMismatchError(len(ctor.params), len(c.params), c.loc)
             ps = [Param(n, p.type, False) for n, p in zip(c.params, c_params)]
@@ -516,11 +674,42 @@ class TypeChecker:
             self._exhaust(n.loc, c, data, arg_ty)
         return ir.Match(arg, cases), ty
 
-    def _inliner(self):
-        return ir.Inliner(self.holes, self.globals)
+    def _inliner(self, can_recurse=True):
+        if self.nbe:
+            return nbe.Evaluator(
+                self.holes,
+                self.globals,
+                can_recurse,
+                decls=self.decls,
+                instances=self.instances,
+            )
+        return ir.Inliner(
+            self.holes, self.globals, can_recurse, instances=self.instances
+        )
+
+    def _zonk(self, v: ir.IR):
+        return ir.Inliner(
+            self.holes, self.globals, False, instances=self.instances
+        ).run(v)
+
+    def _whnf(self, v: ir.IR):
+        return self._inliner().whnf(v)
+
+    def _show(self, v: ir.IR):
+        return str(self._inliner().run(v))
+
+    def _instance(self, ty: ir.IR):
+        c = self._inliner().run(ty)
+        if _is_solved_class(c):
+            c = _c(ir.Class, c)
+            if not self.instances.resolve(self.holes, self.globals, c):
+                raise ir.NoInstanceError(str(c), self.globals[c.name.id].loc)
 
     def _eq(self, got: ir.IR, want: ir.IR):
-        return ir.Converter(self.holes, self.globals).eq(got, want)
+        if not self.nbe:
+            return ir.Converter(self.holes, self.globals).eq(got, want)
+        i = self._inliner()
+        return ir.Converter(self.holes, self.globals, i.run_with, i.whnf).eq(got, want)
 
     def _check_with(self, n: Node, typ: ir.IR, *ps: Param[ir.IR]):
         self.locals.update({p.name.id: p for p in ps})
@@ -548,12 +737,12 @@ class TypeChecker:
                 if p.is_implicit
                 else ir.Ref(p.name)
             )
-            ty = self._inliner().run_with(ty.ret, (p.name, x))
+            ty = self._inliner(False).run_with(ty.ret, (p.name, x))
 
             if miss > 0:
                 miss -= 1
                 assert isinstance(v, ir.Fn)
-                v = self._inliner().run_with(v.body, (v.param.name, x))
+                v = self._inliner(False).run_with(v.body, (v.param.name, x))
 
         params = []
         while isinstance(v, ir.Fn):
@@ -608,4 +797,239 @@ def _call_placeholder(f: Node):
     return Call(f.loc, f, Placeholder(f.loc, False), True)
 
 
-check_string = lambda s, md=False: s | Parser(md) | NameResolver() | TypeChecker()
+def _refs(n: Node | Decl | Param[Node]) -> Iterator[int]:
+    if isinstance(n, Ref):
+        yield n.name.id
+    elif isinstance(n, Param):
+        yield from _refs(n.type)
+    elif isinstance(n, FnType):
+        yield from chain(_refs(n.param), _refs(n.ret))
+    elif isinstance(n, Fn):
+        yield from _refs(n.body)
+    elif isinstance(n, Call):
+        yield from chain(_refs(n.callee), _refs(n.arg))
+    elif isinstance(n, Nomatch):
+        yield from _refs(n.arg)
+    elif isinstance(n, Match):
+        yield from _refs(n.arg)
+        for c in n.cases:
+            yield from chain(_refs(c.ctor), _refs(c.body))
+    elif isinstance(n, Def) or isinstance(n, Example):
+        yield from chain(*map(_refs, n.params), _refs(n.ret), _refs(n.body))
+    elif isinstance(n, Data):
+        yield from chain(*map(_refs, n.params))
+        for c in n.ctors:
+            yield from chain(*map(_refs, c.params))
+            yield from chain(*(chain(_refs(x), _refs(v)) for x, v in c.ty_args))
+    elif isinstance(n, Class):
+        yield from chain(*map(_refs, n.params), *(_refs(f.type) for f in n.fields))
+    elif isinstance(n, Instance):
+        yield from _refs(n.type)
+        yield from chain(*(chain(_refs(x), _refs(v)) for x, v in n.fields))
+
+
+def dependencies(ds: list[Decl]) -> list[set[int]]:
+    owners: dict[int, int] = {}
+    instances: dict[int, list[int]] = {}
+    ret = []
+    for i, d in enumerate(ds):
+        deps = {owners[r] for r in _refs(d) if r in owners}
+        classes = [j for j in deps if isinstance(ds[j], Class)]
+        deps.update(*(instances[j] for j in classes))
+        if isinstance(d, Instance):
+            [instances[j].append(i) for j in classes]
+        elif isinstance(d, Class):
+            instances[i] = []
+        owners.update({n.id: i for n in _defs(d)})
+        ret.append(deps)
+    return ret
+
+
+def _leaves(ds: list[Decl], deps: list[set[int]]):
+    used = set().union(*deps)
+    last = max((i for i, d in enumerate(ds) if isinstance(d, Instance)), default=-1)
+    return {
+        i
+        for i, d in enumerate(ds)
+        if i not in used and i > last and (isinstance(d, Def) or isinstance(d, Example))
+    }
+
+
+_LEAF_IDS = 1 << 24
+
+_worker: list[TypeChecker] = []
+
+
+def _init_worker(globals: dict[int, Decl], holes, nbe: bool):
+    _worker.append(TypeChecker(globals, holes=holes, nbe=nbe))
+
+
+def _check_leaf(d: Decl, ids: int):
+    fresh_from(ids)
+    checker = _worker[0]
+    start = len(checker.holes)
+    ret = checker._run(d)
+    try:
+        checker._check_holes(start)
+    except UnsolvedPlaceholderError as e:
+        return ret, e
+    return ret, None
+
+
+def _defs(d: Decl) -> list[Name]:
+    if isinstance(d, Def):
+        return [d.name]
+    if isinstance(d, Data):
+        return [d.name, *(c.name for c in d.ctors)]
+    if isinstance(d, Class):
+        return [*(f.name for f in d.fields), d.name]
+    return []
+
+
+@dataclass(frozen=True)
+class _Entry:
+    chunk: str
+    decl: Decl
+    refs: set[int]
+    holes: list[tuple[int, ir.Hole]]
+
+    def stale_ids(self, globals: dict[int, Decl]):
+        if not isinstance(self.decl, Instance):
+            return {n.id for n in _defs(self.decl)}
+        c = _c(Class, globals[_c(ir.Class, self.decl.type).name.id])
+        return {c.name.id, *(f.name.id for f in c.fields)}
+
+
+@dataclass
+class Incremental:
+    is_markdown: bool = False
+    entries: list[_Entry] = field(default_factory=list)
+    globals: dict[int, Decl] = field(default_factory=dict)
+    reused: int = 0
+    rechecked: int = 0
+
+    def check(self, text: str):
+        located = Parser(self.is_markdown).located(text)
+        decls = [d for _, d, _ in located]
+        chunks = [text[start:end].strip() for start, _, end in located]
+
+        olds: dict[str, list[_Entry]] = {}
+        for e in self.entries:
+            olds.setdefault(e.chunk, []).append(e)
+        matched = [olds[c].pop(0) if olds.get(c) else None for c in chunks]
+        stale = set().union(
+            *(e.stale_ids(self.globals) for es in olds.values() for e in es)
+        )
+
+        resolver, checker = NameResolver(), TypeChecker()
+        entries, ret, reused = [], [], 0
+        for d, chunk, old in zip(decls, chunks, matched):
+            if old and not old.refs & stale and self._defined(old, checker):
+                moved = _moved(old.decl, d.loc - old.decl.loc)
+                e = _Entry(chunk, moved, old.refs, old.holes)
+                for name in _defs(e.decl):
+                    resolver._insert_global(e.decl.loc, name)
+                _restore(checker, e.decl)
+                checker.holes.update(e.holes)
+                reused += 1
+            else:
+                if old:
+                    stale |= old.stale_ids(self.globals)
+                r = resolver._decl(d)
+                start = fresh()
+                checked = checker._run(r)
+                hs = takewhile(lambda h: h[0] > start, reversed(checker.holes.items()))
+                e = _Entry(chunk, checked, set(_refs(r)), list(hs)[::-1])
+                if isinstance(checked, Instance):
+                    stale |= e.stale_ids(checker.globals)
+            entries.append(e)
+            ret.append(e.decl)
+        checker._check_holes()
+
+        self.entries, self.globals = entries, checker.globals
+        self.reused, self.rechecked = reused, len(entries) - reused
+        return ret
+
+    def _defined(self, e: _Entry, checker: TypeChecker):
+        own = {n.id for n in _defs(e.decl)}
+        return all(r in checker.globals for r in e.refs - own if r in self.globals)
+
+
+def _moved(d: Decl, delta: int) -> Decl:
+    if isinstance(d, Data):
+        ctors = [replace(c, loc=c.loc + delta) for c in d.ctors]
+        return replace(d, loc=d.loc + delta, ctors=ctors)
+    if isinstance(d, Class):
+        fields = [replace(f, loc=f.loc + delta) for f in d.fields]
+        return replace(d, loc=d.loc + delta, fields=fields, instances=[], index={})
+    return replace(d, loc=d.loc + delta)
+
+
+def _restore(checker: TypeChecker, d: Decl):
+    if isinstance(d, Def):
+        checker.globals[d.name.id] = d
+    elif isinstance(d, Data):
+        checker.globals[d.name.id] = d
+        checker.globals.update({c.name.id: c for c in d.ctors})
+    elif isinstance(d, Class):
+        checker.globals.update({f.name.id: f for f in d.fields})
+        checker.globals[d.name.id] = d
+    elif isinstance(d, Instance):
+        c = _c(ir.Class, d.type)
+        ir.add_instance(_c(Class, checker.globals[c.name.id]), d)
+        checker.globals[d.id] = d
+
+
+check_string = lambda s, md=False, jobs=1: (
+    s | Parser(md) | NameResolver() | TypeChecker(jobs=jobs)
+)
+
+ERRORS = (
+    DuplicateVariableError,
+    UndefinedVariableError,
+    TypeMismatchError,
+    UnsolvedPlaceholderError,
+    UnknownCaseError,
+    DuplicateCaseError,
+    CaseParamMismatchError,
+    CaseMissError,
+    FieldMissError,
+    UnknownFieldError,
+    ir.NoInstanceError,
+)
+
+
+def check_all(s: str, md=False) -> tuple[list[Decl], list[Exception]]:
+    resolver, checker = NameResolver(), TypeChecker()
+    ret, errors, failed, spans = [], [], set(), []
+    for d in s | Parser(md):
+        try:
+            r = resolver._decl(d)
+        except ERRORS as e:
+            errors.append(e)
+            for n in _defs(d):
+                if not n.is_unbound():
+                    resolver.globals.setdefault(n.text, n)
+            failed.update(n.id for n in _defs(d))
+            continue
+        if failed.intersection(_refs(r)):
+            failed.update(n.id for n in _defs(r))
+            continue
+        start = len(checker.holes)
+        try:
+            ret.append(checker._run(r))
+            spans.append((start, len(checker.holes)))
+        except ERRORS as e:
+            errors.append(e)
+            failed.update(n.id for n in _defs(r) if n.id not in checker.globals)
+    for start, stop in spans:
+        try:
+            checker._check_holes(start, stop)
+        except UnsolvedPlaceholderError as e:
+            errors.append(e)
+    return ret, sorted(errors, key=lambda e: e.args[-1])
+
+
+def check_stream(s: str, md=False, backend="pratt") -> Iterator[Decl]:
+    ds = NameResolver().stream(Parser(md, backend).stream(s))
+    return TypeChecker().stream(ds)
@@ -0,0 +1,80 @@
+import json
+import platform
+import sys
+import time
+from argparse import ArgumentParser
+from pathlib import Path
+from typing import Optional
+
+from .. import ast
+from ..cache import VERSION
+from . import nodes
+from .workloads import WORKLOADS
+
+STAGES = ("parse", "resolve", "check")
+
+
+def stages(src: str, md: bool, backend: str):
+    t0 = time.perf_counter()
+    parsed = list(src | ast.Parser(md, backend))
+    t1 = time.perf_counter()
+    resolved = parsed | ast.NameResolver()
+    t2 = time.perf_counter()
+    resolved | ast.TypeChecker()
+    t3 = time.perf_counter()
+    return t1 - t0, t2 - t1, t3 - t2
+
+
+def measure(name: str, n: int, repeat: int, backend: str):
+    gen, md, _ = WORKLOADS[name]
+    src = gen(n)
+    ret = {"workload": name, "size": n, "bytes": len(src.encode())}
+    try:
+        runs = [stages(src, md, backend) for _ in range(repeat)]
+    except RecursionError:
+        return {**ret, "error": "RecursionError"}
+    return {**ret, **{s: min(ts) for s, ts in zip(STAGES, zip(*runs))}}
+
+
+def compare(results: list[dict], baseline: dict):
+    old = {(r["workload"], r["size"]): r for r in baseline["results"]}
+    for r in results:
+        b = old.get((r["workload"], r["size"]))
+        if not b or "error" in r or "error" in b:
+            continue
+        ratios = "  ".join(f"{s} {r[s] / b[s]:5.2f}x" for s in STAGES if b[s])
+        print(f"{r['workload']:>10} {r['size']:>5}  {ratios}", file=sys.stderr)
+
+
+def main(argv: Optional[list[str]] = None):
+    p = ArgumentParser(prog="python -m TinyLean.benchmarks")
+    p.add_argument("workloads", nargs="*", choices=list(WORKLOADS))
+    p.add_argument("--sizes", type=int, nargs="+")
+    p.add_argument("--repeat", type=int, default=3)
+    p.add_argument("--backend", choices=["pyparsing", "pratt"], default="pyparsing")
+    p.add_argument("--baseline", type=Path)
+    args = p.parse_args(argv)
+
+    results = [
+        measure(name, n, args.repeat, args.backend)
+        for name in args.workloads or WORKLOADS
+        for n in args.sizes or WORKLOADS[name][2]
+    ]
+    print(
+        json.dumps(
+            {
+                "version": VERSION,
+                "python": platform.python_version(),
+                "backend": args.backend,
+                "nodes": nodes.run(),
+                "results": results,
+            },
+            indent=2,
+        )
+    )
+    if args.baseline:
+        compare(results, json.loads(args.baseline.read_text(encoding="utf-8")))
+
+
+if __name__ == "__main__":
+    main()
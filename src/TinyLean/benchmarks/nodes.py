@@ -0,0 +1,37 @@
+import json
+import timeit
+import tracemalloc
+
+from .. import Name, Param, ir
+
+OBJECTS_PER_STEP = 6
+
+
+def build(n: int) -> ir.IR:
+    v: ir.IR = ir.Type()
+    for _ in range(n):
+        x = Name("x")
+        v = ir.Call(ir.Fn(Param(x, ir.Type(), False), ir.Ref(x)), v)
+    return v
+
+
+def run(n=100_000, repeat=5):
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    v = build(n)
+    size = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+    del v
+
+    t = min(timeit.repeat(lambda: build(n), number=1, repeat=repeat))
+
+    objects = n * OBJECTS_PER_STEP
+    return {
+        "objects": objects,
+        "bytes_per_object": round(size / objects, 1),
+        "ns_per_object": round(t / objects * 1e9, 1),
+    }
+
+
+if __name__ == "__main__":
+    print(json.dumps(run()))
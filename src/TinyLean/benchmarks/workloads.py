@@ -0,0 +1,118 @@
+NAT = """
+inductive N where
+| Z
+| S (n: N)
+open N
+"""
+
+
+def church(n: int):
+    s = " ".join(["S (" * n, "Z", ")" * n])
+    return f"""
+def Nat: Type := (T: Type) -> (S: (n: T) -> T) -> (Z: T) -> T
+
+def add (a: Nat) (b: Nat): Nat := fun T S Z => (a T S) (b T S Z)
+
+def mul (a: Nat) (b: Nat): Nat := fun T S Z => (a T) (b T S) Z
+
+def _2: Nat := fun T S Z => S (S Z)
+
+def big: Nat := fun T S Z => {s}
+
+def double: Nat := add big big
+
+def twice: Nat := mul _2 big
+"""
+
+
+def inductive(n: int):
+    ctors = "\n".join(f"| C{i}" + (" (x: D)" if i % 2 else "") for i in range(n))
+    cases = "\n".join(
+        f"  | C{i}" + (" x => x" if i % 2 else " => C0") for i in range(n)
+    )
+    return f"""
+inductive D where
+{ctors}
+open D
+
+def f (d: D): D :=
+  match d with
+{cases}
+"""
+
+
+def matches(n: int):
+    body = f"p{n}"
+    for i in reversed(range(n)):
+        a = f"p{i}" if i else "a"
+        body = f"match {a} with | Z => Z | S p{i + 1} => {body}"
+    return f"{NAT}\ndef f (a: N): N := {body}\n"
+
+
+def instances(n: int):
+    ds = "\n".join(
+        f"""
+inductive T{i} where
+| M{i}
+open T{i}
+
+instance: Default T{i}
+where
+  default := M{i}
+
+def d{i}: T{i} := default T{i}
+"""
+        for i in range(n)
+    )
+    return f"""
+class Default (T: Type) where
+  default: T
+open Default
+{ds}"""
+
+
+def conversion(n: int, depth=5):
+    ds = "\n".join(f"def n{i + 1}: Nat := add n{i} n{i}" for i in range(depth))
+    t = f"Eq (T := Nat) n{depth} n{depth}"
+    ex = "\n".join(f"example (x: {t}): {t} := x" for _ in range(n))
+    return f"""
+def Nat: Type := (T: Type) -> (S: (n: T) -> T) -> (Z: T) -> T
+
+def add (a: Nat) (b: Nat): Nat := fun T S Z => (a T S) (b T S Z)
+
+def n0: Nat := fun T S Z => S (S Z)
+{ds}
+
+inductive Eq {{T: Type}} (a: T) (b: T) where
+| Refl (a := b)
+open Eq
+{ex}
+"""
+
+
+def markdown(n: int):
+    sections = "\n".join(
+        f"""
+## Section {i}
+
+Some prose about `id{i}`, which is the identity function.
+
+```lean
+def id{i} {{T: Type}} (a: T): T := a
+
+example := id{i} Type
+```
+"""
+        for i in range(n)
+    )
+    return f"# Benchmark\n{sections}"
+
+
+WORKLOADS = {
+    "church": (church, False, (2, 4, 8)),
+    "inductive": (inductive, False, (10, 50, 100)),
+    "matches": (matches, False, (2, 4, 8)),
+    "instances": (instances, False, (10, 50, 100)),
+    "conversion": (conversion, False, (10, 50, 100)),
+    "markdown": (markdown, True, (10, 50, 100)),
+}
@@ -0,0 +1,71 @@
+import os
+import pickle
+import stat
+from hashlib import sha256
+from importlib.metadata import version, PackageNotFoundError
+from pathlib import Path
+from typing import Optional
+
+from . import Decl, fresh, fresh_from
+
+FORMAT = b"TinyLean.cache/3"
+
+SUFFIX = ".tlc"
+
+try:
+    VERSION = version("TinyLean")
+except PackageNotFoundError:
+    VERSION = "0"
+
+
+def key(data: bytes, is_markdown: bool):
+    h = sha256(FORMAT + VERSION.encode() + bytes([is_markdown]))
+    h.update(data)
+    return h.hexdigest()
+
+
+def directory():
+    if d := os.environ.get("TINYLEAN_CACHE_DIR"):
+        return Path(d)
+    base = os.environ.get("XDG_CACHE_HOME") or Path.home() / ".cache"
+    return Path(base) / "tinylean"
+
+
+def _private(p: Path):
+    if os.name != "posix":
+        return True
+    st = p.stat()
+    return st.st_uid == os.getuid() and not st.st_mode & (stat.S_IWGRP | stat.S_IWOTH)
+
+
+def path_of(root: Path, data: bytes, is_markdown: bool):
+    return root / (key(data, is_markdown) + SUFFIX)
+
+
+def load(data: bytes, is_markdown: bool, root=None) -> Optional[list[Decl]]:
+    root = root or directory()
+    p = path_of(root, data, is_markdown)
+    try:
+        if not (_private(root) and _private(p)):
+            return None
+        with open(p, "rb") as f:
+            start, decls = pickle.load(f)
+    except Exception:
+        return None
+    fresh_from(start)
+    return decls
+
+
+def store(data: bytes, is_markdown: bool, decls: list[Decl], root=None):
+    root = root or directory()
+    p = path_of(root, data, is_markdown)
+    tmp = p.with_suffix(f".{os.getpid()}.tmp")
+    try:
+        root.mkdir(mode=0o700, parents=True, exist_ok=True)
+        if not _private(root):
+            return
+        with open(tmp, "wb") as f:
+            pickle.dump((fresh(), decls), f)
+        os.replace(tmp, p)
+    except (OSError, RecursionError, pickle.PicklingError):
+        tmp.unlink(missing_ok=True)
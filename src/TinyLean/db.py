@@ -0,0 +1,179 @@
+from dataclasses import dataclass, field
+from typing import Any, Callable
+
+from . import Name, Param, Decl
+from .ir import (
+    IR,
+    Type,
+    Ref,
+    FnType,
+    Fn,
+    Call,
+    Placeholder,
+    Data,
+    Ctor,
+    Lit,
+    Nomatch,
+    Case,
+    Match,
+    Recur,
+    Class,
+    Field,
+    children,
+)
+
+
+@dataclass(frozen=True, slots=True)
+class Var(IR):
+    idx: int
+    name: Name
+
+    def _pieces(self):
+        return [self.name]
+
+
+@dataclass(frozen=True)
+class Closer:
+    levels: dict[int, int] = field(default_factory=dict)
+
+    def run(self, v: IR) -> IR:
+        if isinstance(v, Ref):
+            if (lvl := self.levels.get(v.name.id)) is not None:
+                return Var(len(self.levels) - lvl - 1, v.name)
+            return v
+        if isinstance(v, Call):
+            return Call(self.run(v.callee), self.run(v.arg))
+        if isinstance(v, Fn):
+            p = self._param(v.param)
+            return Fn(p, self._with(v.body, p))
+        if isinstance(v, FnType):
+            p = self._param(v.param)
+            return FnType(p, self._with(v.ret, p))
+        if isinstance(v, Data):
+            return Data(v.name, [self.run(x) for x in v.args])
+        if isinstance(v, Ctor):
+            return Ctor(v.ty_name, v.name, [self.run(x) for x in v.args])
+        if isinstance(v, Match):
+            return Match(
+                self.run(v.arg), {i: self._case(c) for i, c in v.cases.items()}
+            )
+        if isinstance(v, Class):
+            return Class(v.name, [self.run(x) for x in v.args])
+        if isinstance(v, Field):
+            return Field(v.name, self.run(v.type))
+        assert any(isinstance(v, c) for c in (Type, Placeholder, Nomatch, Recur, Lit))
+        return v
+
+    def _param(self, p: Param[IR]):
+        return Param(p.name, self.run(p.type), p.is_implicit, p.is_class)
+
+    def _case(self, c: Case):
+        params = []
+        for p in c.params:
+            params.append(self._param(p))
+            self.levels[p.name.id] = len(self.levels)
+        body = self.run(c.body)
+        [self.levels.pop(p.name.id) for p in c.params]
+        return Case(c.ctor, params, body)
+
+    def _with(self, v: IR, p: Param[IR]):
+        self.levels[p.name.id] = len(self.levels)
+        ret = self.run(v)
+        del self.levels[p.name.id]
+        return ret
+
+
+@dataclass(frozen=True)
+class Opener:
+    names: list[Name] = field(default_factory=list)
+    ground: set[int] = field(default_factory=set)
+
+    def run(self, v: IR) -> IR:
+        if id(v) in self.ground:
+            return v
+        if isinstance(v, Var):
+            return Ref(self.names[-v.idx - 1])
+        if isinstance(v, Call):
+            return Call(self.run(v.callee), self.run(v.arg))
+        if isinstance(v, Fn):
+            p = self._param(v.param)
+            return Fn(p, self._with(v.body, p))
+        if isinstance(v, FnType):
+            p = self._param(v.param)
+            return FnType(p, self._with(v.ret, p))
+        if isinstance(v, Data):
+            return Data(v.name, [self.run(x) for x in v.args])
+        if isinstance(v, Ctor):
+            return Ctor(v.ty_name, v.name, [self.run(x) for x in v.args])
+        if isinstance(v, Match):
+            return Match(
+                self.run(v.arg), {i: self._case(c) for i, c in v.cases.items()}
+            )
+        if isinstance(v, Class):
+            return Class(v.name, [self.run(x) for x in v.args])
+        if isinstance(v, Field):
+            return Field(v.name, self.run(v.type))
+        leaves = (Type, Ref, Placeholder, Nomatch, Recur, Lit)
+        assert any(isinstance(v, c) for c in leaves)
+        return v
+
+    def _param(self, p: Param[IR]):
+        return Param(Name(p.name.text), self.run(p.type), p.is_implicit, p.is_class)
+
+    def _case(self, c: Case):
+        params = []
+        for p in c.params:
+            params.append(q := self._param(p))
+            self.names.append(q.name)
+        body = self.run(c.body)
+        del self.names[len(self.names) - len(params) :]
+        return Case(c.ctor, params, body)
+
+    def _with(self, v: IR, p: Param[IR]):
+        self.names.append(p.name)
+        ret = self.run(v)
+        self.names.pop()
+        return ret
+
+
+to_db = lambda v: Closer().run(v)
+from_db = lambda v: Opener().run(v)
+
+
+def _ground(v: IR, ids: set[int]) -> bool:
+    xs = children(v)
+    ok = all([_ground(x, ids) for x in xs])
+    if ok and not any(isinstance(v, c) for c in (Fn, FnType, Match, Var, Nomatch)):
+        ids.add(id(v))
+        return True
+    return False
+
+
+@dataclass
+class Cache:
+    entries: dict[tuple, tuple[tuple, tuple, set[int]]] = field(default_factory=dict)
+    hits: int = 0
+    misses: int = 0
+
+    def closed(self, f: Callable[..., tuple], *args: Any):
+        key = (f, *(a.name.id if isinstance(a, Decl) else a for a in args))
+        e = self.entries.get(key)
+        if e and all(x is y for x, y in zip(e[0], args)):
+            self.hits += 1
+            return e
+        self.misses += 1
+        ret = tuple(to_db(x) if isinstance(x, IR) else x for x in f(*args))
+        ground: set[int] = set()
+        [_ground(x, ground) for x in ret if isinstance(x, IR)]
+        e = self.entries[key] = args, ret, ground
+        return e
+
+    def get(self, f: Callable[..., tuple], *args: Any):
+        _, ret, ground = self.closed(f, *args)
+        return tuple(
+            Opener(ground=ground).run(x) if isinstance(x, IR) else x for x in ret
+        )
+
+    def hit_rate(self):
+        total = self.hits + self.misses
+        return self.hits / total if total else 0.0
@@ -0,0 +1,135 @@
+import mmap
+import os
+import re
+import sys
+from bisect import bisect_left
+from contextlib import nullcontext
+from dataclasses import dataclass
+from functools import cached_property
+from pathlib import Path
+from typing import Callable, Optional
+
+from . import Decl, ast, ir, cache, pratt
+
+
+@dataclass(frozen=True)
+class Diagnostic:
+    file: str
+    message: str
+    line: int = 0
+    col: int = 0
+
+    def __str__(self):
+        if not self.line:
+            return self.message
+        return f"{self.file}:{self.line}:{self.col}: {self.message}"
+
+
+@dataclass(frozen=True)
+class Source:
+    file: str
+    data: bytes | mmap.mmap
+
+    @cached_property
+    def text(self):
+        return str(self.data, "utf-8")
+
+    @cached_property
+    def newlines(self):
+        return [m.start() for m in re.finditer("\n", self.text)]
+
+    def locate(self, loc: int):
+        i = bisect_left(self.newlines, loc)
+        return i + 1, loc - (self.newlines[i - 1] if i else -1)
+
+    def at(self, loc: int, m: str):
+        return Diagnostic(self.file, m, *self.locate(loc))
+
+
+def mapped(f):
+    if not os.fstat(f.fileno()).st_size:
+        return nullcontext(b"")
+    return mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+
+def _parse_errors():
+    p = sys.modules.get("pyparsing")
+    return (p.ParseBaseException,) if p else ()
+
+
+def diagnose(src: Source, run: Callable[[], object]) -> Optional[Diagnostic]:
+    try:
+        run()
+    except (*_parse_errors(), pratt.ParseError, *ast.ERRORS) as e:
+        return describe(src, e)
+    return None
+
+
+def describe(src: Source, e: Exception) -> Diagnostic:
+    if isinstance(e, _parse_errors()):
+        return src.at(e.loc, str(e).split("(at char")[0].strip())
+    if isinstance(e, pratt.ParseError):
+        m, loc = e.args
+        return src.at(loc, m)
+    if isinstance(e, ast.UndefinedVariableError):
+        v, loc = e.args
+        return src.at(loc, f"undefined variable '{v}'")
+    if isinstance(e, ast.DuplicateVariableError):
+        v, loc = e.args
+        return src.at(loc, f"duplicate variable '{v}'")
+    if isinstance(e, ast.TypeMismatchError):
+        want, got, loc = e.args
+        return src.at(loc, f"type mismatch:\nwant:\n  {want}\n\ngot:\n  {got}")
+    if isinstance(e, ast.UnsolvedPlaceholderError):
+        name, ctx, ty, loc = e.args
+        ty_msg = f"  {name} : {ty}"
+        ctx_msg = "".join([f"\n  {p}" for p in ctx.values()]) if ctx else " (none)"
+        return src.at(loc, f"unsolved placeholder:\n{ty_msg}\n\ncontext:{ctx_msg}")
+    if isinstance(e, ast.UnknownCaseError):
+        want, got, loc = e.args
+        return src.at(loc, f"cannot match case '{got}' of type '{want}'")
+    if isinstance(e, ast.DuplicateCaseError):
+        name, loc = e.args
+        return src.at(loc, f"duplicate case '{name}'")
+    if isinstance(e, ast.CaseParamMismatchError):
+        want, got, loc = e.args
+        return src.at(loc, f"want '{want}' case parameters, but got '{got}'")
+    if isinstance(e, ast.CaseMissError):
+        miss, loc = e.args
+        return src.at(loc, f"missing case: {miss}")
+    if isinstance(e, ast.FieldMissError):
+        miss, loc = e.args
+        return src.at(loc, f"missing field: {miss}")
+    if isinstance(e, ast.UnknownFieldError):
+        want, got, loc = e.args
+        return src.at(loc, f"unknown field '{got}' of class '{want}'")
+    assert isinstance(e, ir.NoInstanceError)
+    name, loc = e.args
+    return src.at(loc, f"no such instance for class '{name}'")
+
+
+def diagnose_all(src: Source, md: bool, done: Callable[[list[Decl]], object]):
+    ret: list[Diagnostic] = []
+
+    def run():
+        decls, errors = ast.check_all(src.text, md)
+        ret.extend(describe(src, e) for e in errors)
+        if not errors:
+            done(decls)
+
+    d = diagnose(src, run)
+    return [d] if d else ret
+
+
+def check_file(file: Path, cached=False) -> list[Diagnostic]:
+    try:
+        with open(file, "rb") as f, mapped(f) as data:
+            src = Source(str(file), data)
+            md = file.suffix == ".md"
+            if not cached:
+                return diagnose_all(src, md, lambda _: None)
+            if cache.load(data, md) is not None:
+                return []
+            return diagnose_all(src, md, lambda ds: cache.store(data, md, ds))
+    except OSError as e:
+        return [Diagnostic(str(file), str(e))]
@@ -22,14 +22,14 @@ INLINE_WHITE = Opt(Suppress(White(" \t\r"))).set_name("inline_whitespace")
 
 forwards = lambda names: map(lambda n: Forward().set_name(n), names.split())
 
-expr, atom, fn_type, fn, match, nomatch, call, p_expr, type_, ph, ref = forwards(
-    "expr atom fn_type fn match nomatch call paren_expr type placeholder ref"
+expr, atom, fn_type, fn, match, nomatch, call, p_expr, type_, ph, ref, num = forwards(
+    "expr atom fn_type fn match nomatch call paren_expr type placeholder ref number"
 )
 case, i_arg, e_arg = forwards("case implicit_arg explicit_arg")
 
 infix_op = lambda s: (one_of(s), 2, OpAssoc.LEFT)
 expr <<= infix_notation(atom, [infix_op("* /"), infix_op("+ -")])
-atom <<= fn_type | fn | match | nomatch | call | p_expr | type_ | ph | ref
+atom <<= fn_type | fn | match | nomatch | call | p_expr | type_ | ph | ref | num
 
 name = Group(IDENT).set_name("name")
 i_param = (LBRACE + name + COLON + expr + RBRACE).set_name("implicit_param")
@@ -44,11 +44,12 @@ nomatch <<= (NOMATCH - INLINE_WHITE + e_arg).leave_whitespace()
 callee = ref | p_expr
 call <<= (callee + OneOrMore(INLINE_WHITE + (i_arg | e_arg))).leave_whitespace()
 i_arg <<= LPAREN + IDENT + ASSIGN + expr + RPAREN
-e_arg <<= (type_ | ph | ref | p_expr).leave_whitespace()
+e_arg <<= (type_ | ph | ref | num | p_expr).leave_whitespace()
 p_expr <<= LPAREN + expr + RPAREN
 type_ <<= Group(TYPE)
 ph <<= Group(UNDER)
 ref <<= Group(name)
+num <<= Regex(r"[0-9]+")
 
 return_type = Opt(COLON + expr)
 params = Group(ZeroOrMore(param))
@@ -68,6 +69,19 @@ inst = (INST - COLON + expr + WHERE + Group(ZeroOrMore(i_field))).set_name("inst
 declaration = (def_ | example | data | class_ | inst).set_name("declaration")
 
 program = ZeroOrMore(declaration).ignore(COMMENT).set_name("program")
+located = (
+    ZeroOrMore(Group(Located(declaration)))
+    .ignore(COMMENT)
+    .set_name("program")
+    .parse_with_tabs()
+)
+
+
+class GoTo(Token):
+    def __init__(self, loc: int):
+        super().__init__()
+        self.target = loc
+        self.leave_whitespace()
 
-line_exact = lambda w: Suppress(AtLineStart(w) + LineEnd())
-markdown = line_exact("```lean") + program + line_exact("```")
+    def parseImpl(self, instring, loc, do_actions=True):
+        return self.target, []
@@ -1,7 +1,7 @@
 from contextlib import contextmanager
 from dataclasses import dataclass, field
 from functools import reduce as _r
-from typing import Optional, cast as _c, OrderedDict
+from typing import Callable, Optional, cast as _c, OrderedDict
 
 from . import (
     Name,
@@ -17,183 +17,354 @@ from . import (
 )
 
 
-@dataclass(frozen=True)
-class IR: ...
+@dataclass(frozen=True, slots=True)
+class IR:
+    def __str__(self):
+        todo: list = [self]
+        out: list[str] = []
+        while todo:
+            v = todo.pop()
+            if isinstance(v, IR):
+                todo += reversed(v._pieces())
+            elif isinstance(v, Param):
+                l, r = "()" if not v.is_implicit else "{}" if not v.is_class else "[]"
+                todo += r, v.type, ": ", v.name, l
+            else:
+                out.append(str(v))
+        return "".join(out)
 
+    def _pieces(self) -> list: ...
 
-@dataclass(frozen=True)
+
+def _spaced(xs: list) -> list:
+    return [x for i, v in enumerate(xs) for x in ((" ", v) if i else (v,))]
+
+
+def _applied(head, args: list[IR]) -> list:
+    return ["(", *_spaced([head, *args]), ")"] if args else [head]
+
+
+@dataclass(frozen=True, slots=True)
 class Type(IR):
-    def __str__(self):
-        return "Type"
+    def _pieces(self):
+        return ["Type"]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Ref(IR):
     name: Name
 
-    def __str__(self):
-        return str(self.name)
+    def _pieces(self):
+        return [self.name]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class FnType(IR):
     param: Param[IR]
     ret: IR
 
-    def __str__(self):
-        return f"{self.param} → {self.ret}"
+    def _pieces(self):
+        return [self.param, " → ", self.ret]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Fn(IR):
     param: Param[IR]
     body: IR
 
-    def __str__(self):
-        return f"λ {self.param} ↦ {self.body}"
+    def _pieces(self):
+        return ["λ ", self.param, " ↦ ", self.body]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Call(IR):
     callee: IR
     arg: IR
 
-    def __str__(self):
-        return f"({self.callee} {self.arg})"
+    def _pieces(self):
+        return ["(", self.callee, " ", self.arg, ")"]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Placeholder(IR):
     id: int
     is_user: bool
 
-    def __str__(self):
+    def _pieces(self):
         t = "u" if self.is_user else "m"
-        return f"?{t}.{self.id}"
+        return [f"?{t}.{self.id}"]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Data(IR):
     name: Name
     args: list[IR]
 
-    def __str__(self):
-        s = " ".join(str(x) for x in [self.name, *self.args])
-        return f"({s})" if len(self.args) else s
+    def _pieces(self):
+        return _applied(self.name, self.args)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Ctor(IR):
     ty_name: Name
     name: Name
     args: list[IR]
 
-    def __str__(self):
-        n = f"{self.ty_name}.{self.name}"
-        s = " ".join(str(x) for x in [n, *self.args])
-        return f"({s})" if len(self.args) else s
+    def _pieces(self):
+        return _applied(f"{self.ty_name}.{self.name}", self.args)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
+class Lit(IR):
+    ty_name: Name
+    zero: Name
+    succ: Name
+    value: int
+
+    def _pieces(self):
+        s, z = f"({self.ty_name}.{self.succ} ", f"{self.ty_name}.{self.zero}"
+        return [s] * self.value + [z] + [")"] * self.value
+
+    def unfold(self):
+        if not self.value:
+            return Ctor(self.ty_name, self.zero, [])
+        pred = Lit(self.ty_name, self.zero, self.succ, self.value - 1)
+        return Ctor(self.ty_name, self.succ, [pred])
+
+
+@dataclass(frozen=True, slots=True)
 class Nomatch(IR):
-    def __str__(self):
-        return "nomatch"
+    def _pieces(self):
+        return ["nomatch"]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Case(IR):
     ctor: Name
     params: list[Param[IR]]
     body: IR
 
-    def __str__(self):
-        s = " ".join([str(self.ctor), *map(str, self.params)])
-        return f"| {s} ↦ {self.body}"
+    def _pieces(self):
+        return ["| ", *_spaced([self.ctor, *self.params]), " ↦ ", self.body]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Match(IR):
     arg: IR
     cases: dict[int, Case]
 
-    def __str__(self):
-        cs = " ".join(map(str, self.cases.values()))
-        return f"match {self.arg} with {cs}"
+    def _pieces(self):
+        return ["match ", self.arg, " with ", *_spaced(list(self.cases.values()))]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Recur(IR):
     name: Name
 
-    def __str__(self):
-        return str(self.name)
+    def _pieces(self):
+        return [self.name]
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Class(IR):
     name: Name
     args: list[IR]
 
-    def __str__(self):
-        s = " ".join(str(x) for x in [self.name, *self.args])
-        return f"({s})" if len(self.args) else s
+    def _pieces(self):
+        return _applied(self.name, self.args)
 
     def is_unsolved(self):
         return any(isinstance(a, Ref) for a in self.args)
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Field(IR):
     name: Name
     type: IR
 
-    def __str__(self):
-        return str(self.name)
+    def _pieces(self):
+        return [self.name]
 
 
 @dataclass(frozen=True)
 class Renamer:
     locals: dict[int, int] = field(default_factory=dict)
+    values: dict[int, IR] = field(default_factory=dict)
 
     def run(self, v: IR) -> IR:
-        if isinstance(v, Ref):
-            if v.name.id in self.locals:
-                return Ref(Name(v.name.text, self.locals[v.name.id]))
-            return v
-        if isinstance(v, Call):
-            return Call(self.run(v.callee), self.run(v.arg))
-        if isinstance(v, Fn):
-            return Fn(self._param(v.param), self.run(v.body))
-        if isinstance(v, FnType):
-            return FnType(self._param(v.param), self.run(v.ret))
-        if isinstance(v, Data):
-            return Data(v.name, [self.run(x) for x in v.args])
-        if isinstance(v, Ctor):
-            return Ctor(v.ty_name, v.name, [self.run(x) for x in v.args])
-        if isinstance(v, Match):
-            arg = self.run(v.arg)
-            cases = {
-                i: Case(c.ctor, [self._param(p) for p in c.params], self.run(c.body))
-                for i, c in v.cases.items()
-            }
-            return Match(arg, cases)
-        if isinstance(v, Class):
-            return Class(v.name, [self.run(x) for x in v.args])
-        if isinstance(v, Field):
-            return Field(v.name, self.run(v.type))
-        assert any(isinstance(v, c) for c in (Type, Placeholder, Nomatch, Recur))
-        return v
-
-    def _param(self, p: Param[IR]):
-        typ = self.run(p.type)
+        todo: list = [v]
+        done: list = []
+        while todo:
+            v = todo.pop()
+            if isinstance(v, Ref) and v.name.id in self.values:
+                done.append(self.values[v.name.id])
+            elif isinstance(v, Ref):
+                i = self.locals.get(v.name.id)
+                done.append(v if i is None else Ref(Name(v.name.text, i)))
+            elif isinstance(v, tuple):
+                build, n = v
+                args = done[-n:]
+                del done[-n:]
+                done.append(build(*args))
+            elif isinstance(v, Param):
+                done.append(self._param(v, done.pop()))
+            elif not _parts(v, todo):
+                done.append(v)
+        return done.pop()
+
+    def _param(self, p: Param[IR], typ: IR):
         name = Name(p.name.text)
         self.locals[p.name.id] = name.id
         return Param(name, typ, p.is_implicit, p.is_class)
 
 
+def _parts(v: IR, todo: list):
+    if isinstance(v, Call):
+        todo += (Call, 2), v.arg, v.callee
+    elif isinstance(v, Fn):
+        todo += (Fn, 2), v.body, v.param, v.param.type
+    elif isinstance(v, FnType):
+        todo += (FnType, 2), v.ret, v.param, v.param.type
+    elif isinstance(v, Data) or isinstance(v, Class) or isinstance(v, Ctor):
+        if not v.args:
+            return False
+        todo.append((lambda *xs: _with_args(v, list(xs)), len(v.args)))
+        todo += reversed(v.args)
+    elif isinstance(v, Match):
+        xs, n = [v.arg], 1
+        for c in v.cases.values():
+            xs.extend(x for p in c.params for x in (p.type, p))
+            xs.append(c.body)
+            n += len(c.params) + 1
+        todo.append((lambda *xs: _match(v, xs), n))
+        todo += reversed(xs)
+    elif isinstance(v, Field):
+        todo += (lambda t: Field(v.name, t), 1), v.type
+    else:
+        assert any(isinstance(v, c) for c in (Type, Placeholder, Nomatch, Recur, Lit))
+        return False
+    return True
+
+
+def _with_args(v: Data | Class | Ctor, args: list[IR]):
+    if isinstance(v, Ctor):
+        return Ctor(v.ty_name, v.name, args)
+    return type(v)(v.name, args)
+
+
+def _match(v: Match, xs: tuple):
+    cases, i = {}, 1
+    for k, c in v.cases.items():
+        n = len(c.params)
+        cases[k] = Case(c.ctor, list(xs[i : i + n]), xs[i + n])
+        i += n + 1
+    return Match(xs[0], cases)
+
+
 _rn = lambda v: Renamer().run(v)
 
 
+def _subst(v: IR, *env: tuple[Name, IR]):
+    return Renamer(values={n.id: x for n, x in env}).run(v)
+
+
+@dataclass(frozen=True)
+class Interner:
+    table: dict[tuple, IR] = field(default_factory=dict)
+    classes: dict[tuple, int] = field(default_factory=dict)
+    closed: dict[int, tuple[int, frozenset[int]]] = field(default_factory=dict)
+    scope: list[int] = field(default_factory=list)
+    binders: dict[int, frozenset[int]] = field(default_factory=dict)
+
+    def run(self, v: IR) -> IR:
+        return self._intern(v)[0]
+
+    def _intern(self, v: IR) -> tuple[IR, int, frozenset[int]]:
+        if (c := self.closed.get(id(v))) and c[1].isdisjoint(self.scope):
+            return v, *c
+        names: frozenset[int] = frozenset()
+        if isinstance(v, Ref) and v.name.id in self.scope:
+            key, names = ("var", self.scope[::-1].index(v.name.id)), {v.name.id}
+        elif isinstance(v, Ref) or isinstance(v, Recur):
+            key, names = (type(v), v.name.id), {v.name.id}
+        elif isinstance(v, Call):
+            (f, cf, nf), (x, cx, nx) = self._intern(v.callee), self._intern(v.arg)
+            v, key, names = Call(f, x), (Call, cf, cx), nf | nx
+        elif isinstance(v, Fn) or isinstance(v, FnType):
+            body = v.body if isinstance(v, Fn) else v.ret
+            [(p, cp)], b, cb, names = self._under([v.param], body)
+            v, key = type(v)(p, b), (type(v), *cp, cb)
+        elif isinstance(v, Data) or isinstance(v, Class):
+            args, cs, names = self._args(v.args)
+            v, key = type(v)(v.name, args), (type(v), v.name.id, *cs)
+        elif isinstance(v, Ctor):
+            args, cs, names = self._args(v.args)
+            v = Ctor(v.ty_name, v.name, args)
+            key = (Ctor, v.ty_name.id, v.name.id, *cs)
+        elif isinstance(v, Match):
+            arg, ca, names = self._intern(v.arg)
+            cases, keys = {}, []
+            for i, c in v.cases.items():
+                ps, body, cb, nb = self._under(c.params, c.body)
+                cases[i] = Case(c.ctor, [q for q, _ in ps], body)
+                keys.append((c.ctor.id, *(k for _, k in ps), cb))
+                names |= nb
+            v, key = Match(arg, cases), (Match, ca, *keys)
+        elif isinstance(v, Field):
+            t, ct, names = self._intern(v.type)
+            v, key = Field(v.name, t), (Field, v.name.id, ct)
+        elif isinstance(v, Placeholder):
+            key = (Placeholder, v.id, v.is_user)
+        elif isinstance(v, Nomatch):
+            key = (Nomatch, id(v))
+        elif isinstance(v, Lit):
+            key = (Lit, v.ty_name.id, v.value)
+        else:
+            assert isinstance(v, Type)
+            key = (Type,)
+        names = frozenset(names)
+        cls = self.classes.setdefault(key, len(self.classes))
+        bound = [i for i in reversed(self.scope) if i in names]
+        u = self.table.setdefault((cls, *bound), v)
+        if u is not v and not self._binders(u).isdisjoint(self.scope):
+            return v, cls, names
+        v = u
+        if not bound:
+            self.closed[id(v)] = cls, names
+        return v, cls, names
+
+    def _under(self, params: list[Param[IR]], v: IR):
+        ps, names = [], frozenset()
+        for p in params:
+            t, ct, nt = self._intern(p.type)
+            q = Param(p.name, t, p.is_implicit, p.is_class)
+            ps.append((q, (p.name.text, p.is_implicit, p.is_class, ct)))
+            names |= nt - {q.name.id for q, _ in ps[:-1]}
+            self.scope.append(p.name.id)
+        body, cls, nb = self._intern(v)
+        del self.scope[len(self.scope) - len(params) :]
+        return ps, body, cls, names | (nb - {p.name.id for p in params})
+
+    def _args(self, xs: list[IR]):
+        rs = [self._intern(x) for x in xs]
+        names = frozenset().union(*(n for _, _, n in rs))
+        return [x for x, _, _ in rs], [c for _, c, _ in rs], names
+
+    def _binders(self, v: IR):
+        if (ret := self.binders.get(id(v))) is not None:
+            return ret
+        todo: list = [v]
+        names = set()
+        while todo:
+            x = todo.pop()
+            if isinstance(x, Param):
+                names.add(x.name.id)
+            elif isinstance(x, IR) and not isinstance(x, Ref):
+                _parts(x, todo)
+        ret = self.binders[id(v)] = frozenset(names)
+        return ret
+
+
 def _to(p: list[Param[IR]], v: IR, t=False):
     return _r(lambda a, q: _c(IR, FnType(q, a) if t else Fn(q, a)), reversed(p), v)
 
@@ -236,7 +407,7 @@ def from_field(f: FieldDecl[IR], c: ClassDecl[IR], has_c_param=True):
     return _rn(_to(ps, Field(f.name, t))), _rn(_to(ps, f.type, True))
 
 
-@dataclass
+@dataclass(slots=True)
 class Answer:
     type: IR
     value: Optional[IR] = None
@@ -245,7 +416,7 @@ class Answer:
         return self.value is None
 
 
-@dataclass(frozen=True)
+@dataclass(frozen=True, slots=True)
 class Hole:
     loc: int
     is_user: bool
@@ -265,48 +436,60 @@ def dirty_holes(holes: OrderedDict[int, Hole]):
 class NoInstanceError(Exception): ...
 
 
+@dataclass(slots=True)
+class Thunk:
+    value: IR
+    forced: dict[bool, IR] = field(default_factory=dict)
+
+
 @dataclass
 class Inliner:
     holes: OrderedDict[int, Hole]
     globals: dict[int, Decl]
     can_recurse: bool = True
-    env: dict[int, IR] = field(default_factory=dict)
+    env: dict[int, Thunk] = field(default_factory=dict)
+    instances: Optional["InstanceCache"] = None
 
     def run(self, v: IR) -> IR:
         if isinstance(v, Ref):
-            return self.run(_rn(self.env[v.name.id])) if v.name.id in self.env else v
+            t = self.env.get(v.name.id)
+            return v if t is None else self._force(t)
         if isinstance(v, Call):
+            if n := self._native(v):
+                return n
             f = self.run(v.callee)
             x = self.run(v.arg)
             if isinstance(f, Fn):
                 return self.run_with(f.body, (f.param.name, x))
             return Call(f, x)
         if isinstance(v, Fn):
-            return Fn(self._param(v.param), self.run(v.body))
+            p = self._param(v.param)
+            return Fn(p, self._under([p], v.body))
         if isinstance(v, FnType):
-            return FnType(self._param(v.param), self.run(v.ret))
+            p = self._param(v.param)
+            return FnType(p, self._under([p], v.ret))
         if isinstance(v, Placeholder):
             h = self.holes[v.id]
             h.answer.type = self.run(h.answer.type)
             return v if h.answer.is_unsolved() else self.run(h.answer.value)
         if isinstance(v, Ctor):
-            return Ctor(v.ty_name, v.name, [self.run(v) for v in v.args])
+            v = Ctor(v.ty_name, v.name, [self.run(v) for v in v.args])
+            return to_lit(self.globals, v)
         if isinstance(v, Data):
             return Data(v.name, [self.run(v) for v in v.args])
         if isinstance(v, Match):
             arg = self.run(v.arg)
+            if isinstance(arg, Lit):
+                arg = arg.unfold()
+            if isinstance(arg, Ctor):
+                c = v.cases[arg.name.id]
+                env = [(x.name, v) for x, v in zip(c.params, arg.args)]
+                return self.run_with(c.body, *env)
             can_recurse = self.can_recurse
             self.can_recurse = False
-            cases = {
-                i: Case(c.ctor, [self._param(p) for p in c.params], self.run(c.body))
-                for i, c in v.cases.items()
-            }
+            cases = {i: self._case(c) for i, c in v.cases.items()}
             self.can_recurse = can_recurse
-            if not isinstance(arg, Ctor):
-                return Match(arg, cases)
-            c = cases[arg.name.id]
-            env = [(x.name, v) for x, v in zip(c.params, arg.args)]
-            return self.run_with(c.body, *env)
+            return Match(arg, cases)
         if isinstance(v, Recur):
             if self.can_recurse:
                 d = self.globals[v.name.id]
@@ -323,22 +506,95 @@ class Inliner:
             i = self._resolve_instance(c)
             val = next(val for n, val in i.fields if _c(Ref, n).name.id == v.name.id)
             return self.run(val)
-        assert isinstance(v, Type) or isinstance(v, Nomatch)
+        assert any(isinstance(v, c) for c in (Type, Nomatch, Lit))
         return v
 
     def run_with(self, x: IR, *env: tuple[Name, IR]):
-        self.env.update({n.id: v for n, v in env})
-        return self.run(x)
+        outer = {n.id: self.env.get(n.id) for n, _ in env}
+        self.env.update({n.id: Thunk(v) for n, v in env})
+        ret = self.run(x)
+        for i, t in outer.items():
+            if t is None:
+                del self.env[i]
+            else:
+                self.env[i] = t
+        return ret
 
-    def apply(self, f: IR, *args: IR):
-        ret = f
-        for x in args:
-            if isinstance(ret, Fn):
-                ret = self.run_with(ret.body, (ret.param.name, x))
+    def _force(self, t: Thunk):
+        if (v := t.forced.get(self.can_recurse)) is None:
+            v = t.forced[self.can_recurse] = self.run(_rn(t.value))
+        return v
+
+    def whnf(self, v: IR, delta=True) -> IR:
+        while True:
+            if isinstance(v, Ref) and v.name.id in self.env:
+                t = self.env[v.name.id]
+                v = t.forced.get(self.can_recurse, t.value)
+            elif isinstance(v, Placeholder):
+                h = self.holes[v.id]
+                if h.answer.is_unsolved():
+                    return v
+                v = _c(IR, h.answer.value)
+            elif isinstance(v, Call):
+                if n := self._native(v):
+                    return n
+                f = self.whnf(v.callee, delta)
+                if not isinstance(f, Fn):
+                    return v if f is v.callee else Call(f, v.arg)
+                v = _subst(f.body, (f.param.name, v.arg))
+            elif isinstance(v, Match):
+                arg = self.whnf(v.arg, delta)
+                if isinstance(arg, Lit):
+                    arg = arg.unfold()
+                if not isinstance(arg, Ctor):
+                    return v if arg is v.arg else Match(arg, v.cases)
+                c = v.cases[arg.name.id]
+                v = _subst(c.body, *[(p.name, x) for p, x in zip(c.params, arg.args)])
+            elif isinstance(v, Recur) and delta and self.can_recurse:
+                d = self.globals[v.name.id]
+                if not isinstance(d, Def):
+                    return v
+                v = from_def(d)[0]
+            elif isinstance(v, Field):
+                c = _c(Class, self.run(v.type))
+                if c.is_unsolved():
+                    return Field(v.name, c)
+                i = self._resolve_instance(c)
+                v = next(x for n, x in i.fields if _c(Ref, n).name.id == v.name.id)
             else:
-                ret = Call(ret, x)
+                return v
+
+    def _native(self, v: Call):
+        if not self.can_recurse or not (op := native(self.globals, v)):
+            return None
+        f = _c(Call, v.callee)
+        x, y = self.run(f.arg), self.run(v.arg)
+        if isinstance(x, Lit) and isinstance(y, Lit):
+            return Lit(x.ty_name, x.zero, x.succ, op(x.value, y.value))
+        return self.apply(self.run(f.callee), x, y)
+
+    def _case(self, c: Case):
+        ps = [self._param(p) for p in c.params]
+        return Case(c.ctor, ps, self._under(ps, c.body))
+
+    def _under(self, ps: list[Param[IR]], v: IR):
+        shadowed = {
+            p.name.id: self.env.pop(p.name.id) for p in ps if p.name.id in self.env
+        }
+        ret = self.run(v)
+        self.env.update(shadowed)
         return ret
 
+    def apply(self, f: IR, *args: IR):
+        xs = list(reversed(args))
+        while xs and isinstance(f, Fn):
+            env = []
+            while xs and isinstance(f, Fn):
+                env.append((f.param.name, xs.pop()))
+                f = f.body
+            f = self.run_with(f, *env)
+        return _r(Call, reversed(xs), f)
+
     def _param(self, param: Param[IR]):
         p = Param(param.name, self.run(param.type), param.is_implicit, param.is_class)
         if not p.is_class:
@@ -348,47 +604,341 @@ class Inliner:
             raise NoInstanceError(str(ty), self.globals[ty.name.id].loc)
         return p
 
-    def _resolve_instance(self, c: Class) -> Optional[Instance[IR]]:
-        cls = _c(ClassDecl, self.globals[c.name.id])
-        for inst_id in cls.instances:
-            i = _c(Instance, self.globals[inst_id])
-            with dirty_holes(self.holes):
-                if Converter(self.holes, self.globals).eq(c, i.type):
-                    return i
+    def _resolve_instance(self, c: Class):
+        if self.instances:
+            return self.instances.resolve(self.holes, self.globals, c)
+        return resolve_instance(self.holes, self.globals, c)
+
+
+def resolve_instance(
+    holes: OrderedDict[int, Hole], globals: dict[int, Decl], c: Class
+) -> Optional[Instance[IR]]:
+    cls = _c(ClassDecl, globals[c.name.id])
+    for inst_id in _candidates(cls, c):
+        i = _c(Instance, globals[inst_id])
+        with dirty_holes(holes):
+            if Converter(holes, globals).eq(c, i.type):
+                return i
+    return None
+
+
+_OPS: dict[str, Callable[[int, int], int]] = {
+    "add": lambda x, y: x + y,
+    "sub": lambda x, y: max(x - y, 0),
+    "mul": lambda x, y: x * y,
+}
+
+
+def nat_ctors(globals: dict[int, Decl], name: Name) -> Optional[tuple[Name, Name]]:
+    d = globals.get(name.id)
+    if not isinstance(d, DataDecl) or d.params or len(d.ctors) != 2:
         return None
+    z, s = d.ctors if not d.ctors[0].params else reversed(d.ctors)
+    if z.params or z.ty_args or s.ty_args or len(s.params) != 1:
+        return None
+    p = s.params[0]
+    if p.is_implicit or p.type != Data(name, []):
+        return None
+    return z.name, s.name
+
+
+def to_lit(globals: dict[int, Decl], v: Ctor) -> IR:
+    if len(v.args) > 1 or not (nat := nat_ctors(globals, v.ty_name)):
+        return v
+    z, s = nat
+    if v.name.id == z.id:
+        return Lit(v.ty_name, z, s, 0)
+    x = v.args[0]
+    return Lit(v.ty_name, z, s, x.value + 1) if isinstance(x, Lit) else v
+
+
+def native(globals: dict[int, Decl], v: Call):
+    f = v.callee
+    if not isinstance(f, Call) or not isinstance(f.callee, Recur):
+        return None
+    op = nat_op(globals, f.callee.name)
+    return _OPS[op] if op else None
+
+
+def nat_op(globals: dict[int, Decl], name: Name) -> Optional[str]:
+    d = globals.get(name.id)
+    if not isinstance(d, Def) or len(d.params) != 2 or not isinstance(d.ret, Data):
+        return None
+    if not (nat := nat_ctors(globals, d.ret.name)):
+        return None
+    if any(p.is_implicit or p.type != d.ret for p in d.params):
+        return None
+    n = _Nat(globals, d.ret.name, *nat)
+    a, b = [Ref(p.name) for p in d.params]
+    rec = lambda x, y: Call(Call(Recur(name), x), y)
+    if n.adds(d.body, a, b, rec):
+        return "add"
+    if n.subs(d.body, a, b, rec):
+        return "sub"
+    if n.muls(d.body, a, b, rec, name):
+        return "mul"
+    return None
+
+
+@dataclass(frozen=True)
+class _Nat:
+    globals: dict[int, Decl]
+    ty: Name
+    zero: Name
+    succ: Name
+
+    def split(self, v: IR, x: IR):
+        if not isinstance(v, Match) or v.arg != x:
+            return None
+        if v.cases.keys() != {self.zero.id, self.succ.id}:
+            return None
+        c = v.cases[self.succ.id]
+        return v.cases[self.zero.id].body, Ref(c.params[0].name), c.body
+
+    def is_zero(self, v: IR):
+        return v in (
+            Ctor(self.ty, self.zero, []),
+            Lit(self.ty, self.zero, self.succ, 0),
+        )
+
+    def adds(self, v: IR, x: IR, y: IR, rec: Callable[[IR, IR], IR]):
+        for p, q in (x, y), (y, x):
+            if not (m := self.split(v, p)) or m[0] != q:
+                continue
+            want = rec(m[1], q) if p is x else rec(q, m[1])
+            if m[2] == Ctor(self.ty, self.succ, [want]):
+                return True
+        return False
+
+    def subs(self, v: IR, x: IR, y: IR, rec: Callable[[IR, IR], IR]):
+        if (m := self.split(v, y)) and m[0] == x and (n := self.split(m[2], x)):
+            return self.is_zero(n[0]) and n[2] == rec(n[1], m[1])
+        if (
+            (m := self.split(v, x))
+            and self.is_zero(m[0])
+            and (n := self.split(m[2], y))
+        ):
+            s = Ctor(self.ty, self.succ, [m[1]])
+            return n[0] in (x, s) and n[2] == rec(m[1], n[1])
+        return False
+
+    def muls(self, v: IR, x: IR, y: IR, rec: Callable[[IR, IR], IR], own: Name):
+        for p, q in (x, y), (y, x):
+            if not (m := self.split(v, p)) or not self.is_zero(m[0]):
+                continue
+            s, r = m[2], rec(m[1], q) if p is x else rec(q, m[1])
+            if isinstance(s, Call) and isinstance(s.callee, Call):
+                f = s.callee.callee
+                if self._is_add(f, own) and (s.callee.arg, s.arg) in ((r, q), (q, r)):
+                    return True
+            if not isinstance(s, Match) or not (c := s.cases.get(self.succ.id)):
+                continue
+            if not isinstance(c.body, Ctor) or len(c.body.args) != 1:
+                continue
+            f = c.body.args[0]
+            while isinstance(f, Call):
+                f = f.callee
+            if not self._is_add(f, own):
+                continue
+            add = lambda l, r: Call(Call(f, l), r)
+            if self.adds(s, r, q, add) or self.adds(s, q, r, add):
+                return True
+        return False
+
+    def _is_add(self, f: IR, own: Name):
+        if not isinstance(f, Recur) or f.name.id == own.id:
+            return False
+        return nat_op(self.globals, f.name) == "add"
+
+
+def children(v: IR) -> list[IR]:
+    if isinstance(v, Call):
+        return [v.callee, v.arg]
+    if isinstance(v, Fn):
+        return [v.param.type, v.body]
+    if isinstance(v, FnType):
+        return [v.param.type, v.ret]
+    if isinstance(v, Data) or isinstance(v, Ctor) or isinstance(v, Class):
+        return v.args
+    if isinstance(v, Match):
+        ps = [p.type for c in v.cases.values() for p in c.params]
+        return [v.arg, *ps, *(c.body for c in v.cases.values())]
+    if isinstance(v, Field):
+        return [v.type]
+    return []
+
+
+def _has_holes(v: IR) -> bool:
+    return isinstance(v, Placeholder) or any(_has_holes(x) for x in children(v))
+
+
+@dataclass
+class InstanceCache:
+    interner: Interner = field(default_factory=Interner)
+    resolved: dict[int, tuple[int, Optional[int]]] = field(default_factory=dict)
+    hits: int = 0
+    misses: int = 0
+
+    def resolve(
+        self, holes: OrderedDict[int, Hole], globals: dict[int, Decl], c: Class
+    ) -> Optional[Instance[IR]]:
+        if c.is_unsolved() or _has_holes(c):
+            return resolve_instance(holes, globals, c)
+        cls = _c(ClassDecl, globals[c.name.id])
+        key = id(self.interner.run(c))
+        if r := self.resolved.get(key):
+            n, inst_id = r
+            if inst_id is not None or n == len(cls.instances):
+                self.hits += 1
+                return None if inst_id is None else _c(Instance, globals[inst_id])
+        self.misses += 1
+        i = resolve_instance(holes, globals, c)
+        self.resolved[key] = len(cls.instances), i.id if i else None
+        return i
+
+
+def is_whnf(v: IR, holes: OrderedDict[int, Hole], delta=True):
+    while isinstance(v, Call):
+        v = v.callee
+        if isinstance(v, Fn):
+            return False
+    if isinstance(v, Placeholder):
+        return holes[v.id].answer.is_unsolved()
+    if isinstance(v, Recur):
+        return not delta
+    return not isinstance(v, Match) and not isinstance(v, Field)
+
+
+def _rebind(p: Param[IR], q: Param[IR]):
+    return [] if p.name.id == q.name.id else [(q.name, Ref(p.name))]
+
+
+def _recur_head(v: IR):
+    while isinstance(v, Call):
+        v = v.callee
+    return v.name.id if isinstance(v, Recur) else None
+
+
+def _head(v: IR):
+    if isinstance(v, Data) or isinstance(v, Ctor) or isinstance(v, Class):
+        return type(v), v.name.id
+    if any(isinstance(v, c) for c in (Type, Fn, FnType)):
+        return type(v)
+    return None
+
+
+def add_instance(c: ClassDecl[IR], i: Instance[IR]):
+    c.instances.append(i.id)
+    for pos, arg in enumerate(_c(Class, i.type).args):
+        c.index.setdefault((pos, _head(arg)), set()).add(i.id)
+
+
+def _candidates(c: ClassDecl[IR], ty: Class):
+    ids: Optional[set[int]] = None
+    for pos, arg in enumerate(ty.args):
+        if (h := _head(arg)) is None:
+            continue
+        s = c.index.get((pos, h), set()) | c.index.get((pos, None), set())
+        ids = s if ids is None else ids & s
+    return c.instances if ids is None else sorted(ids)
 
 
 @dataclass(frozen=True)
 class Converter:
     holes: OrderedDict[int, Hole]
     globals: dict[int, Decl]
+    run_with: Optional[Callable[..., IR]] = None
+    whnf: Optional[Callable[[IR, bool], IR]] = None
+    solved: list[Hole] = field(default_factory=list)
 
     def eq(self, lhs: IR, rhs: IR):
+        mark = len(self.solved)
+        if self._conv(lhs, rhs):
+            return True
+        self._rollback(mark)
+        return False
+
+    def _rollback(self, mark: int):
+        for h in self.solved[mark:]:
+            h.answer.value = None
+        del self.solved[mark:]
+
+    def _conv(self, lhs: IR, rhs: IR):
+        todo: list[tuple] = [(lhs, rhs)]
+        while todo:
+            lhs, rhs, *env = todo.pop()
+            if env:
+                rhs = self._run_with(rhs, *env)
+            if lhs is rhs:
+                continue
+            lhs, rhs = self._whnf(lhs, False), self._whnf(rhs, False)
+            if lhs is rhs:
+                continue
+            if (h := _recur_head(lhs)) is not None and h == _recur_head(rhs):
+                if self._spine(lhs, rhs):
+                    continue
+            elif self._step(lhs, rhs, todo):
+                continue
+            if not (unfolded := self._unfold(lhs, rhs)):
+                return False
+            todo.append(unfolded)
+        return True
+
+    def _spine(self, lhs: IR, rhs: IR):
+        mark = len(self.solved)
+        while isinstance(lhs, Call) and isinstance(rhs, Call):
+            if not self.eq(lhs.arg, rhs.arg):
+                break
+            lhs, rhs = lhs.callee, rhs.callee
+        if isinstance(lhs, Recur) and isinstance(rhs, Recur):
+            return True
+        self._rollback(mark)
+        return False
+
+    def _unfold(self, lhs: IR, rhs: IR):
+        l, r = _recur_head(lhs), _recur_head(rhs)
+        sides = [(l, 0), (r, 1)] if (l or 0) >= (r or 0) else [(r, 1), (l, 0)]
+        for head, side in sides:
+            if head is None:
+                continue
+            u = self._whnf((lhs, rhs)[side], True)
+            if _recur_head(u) != head:
+                return (u, rhs) if side == 0 else (lhs, u)
+        return None
+
+    def _step(self, lhs: IR, rhs: IR, todo: list[tuple]):
         match lhs, rhs:
             case Placeholder() as x, y:
-                return self._solve(x, y)
+                return self._solve(x, y, todo)
             case x, Placeholder() as y:
-                return self._solve(y, x)
+                return self._solve(y, x, todo)
             case Ref(x), Ref(y):
                 return x.id == y.id
             case Call(f, x), Call(g, y):
-                return self.eq(f, g) and self.eq(x, y)
+                todo += (x, y), (f, g)
+                return True
             case Fn(p, b), Fn(q, c):
-                env = [(q.name, Ref(p.name))]
-                return self.eq(b, Inliner(self.holes, self.globals).run_with(c, *env))
+                todo.append((b, c, *_rebind(p, q)))
+                return True
             case FnType(p, b), FnType(q, c):
-                if not self.eq(p.type, q.type):
-                    return False
-                env = [(q.name, Ref(p.name))]
-                return self.eq(b, Inliner(self.holes, self.globals).run_with(c, *env))
+                todo += (b, c, *_rebind(p, q)), (p.type, q.type)
+                return True
             case Data(x, xs), Data(y, ys):
-                return x.id == y.id and self._args(xs, ys)
+                return x.id == y.id and self._args(xs, ys, todo)
             case Ctor(t, x, xs), Ctor(u, y, ys):
-                return t.id == u.id and x.id == y.id and self._args(xs, ys)
+                return t.id == u.id and x.id == y.id and self._args(xs, ys, todo)
+            case Lit(t, _, _, x), Lit(u, _, _, y):
+                return t.id == u.id and x == y
+            case Lit() as x, Ctor():
+                todo.append((x.unfold(), rhs))
+                return True
+            case Ctor(), Lit() as y:
+                todo.append((lhs, y.unfold()))
+                return True
             case Type(), Type():
                 return True
             case Class(x, xs), Class(y, ys):
-                return x.id == y.id and self._args(xs, ys)
+                return x.id == y.id and self._args(xs, ys, todo)
 
         # FIXME: Following cases not seen in tests yet:
         assert not (isinstance(lhs, Placeholder) and isinstance(rhs, Placeholder))
@@ -397,11 +947,23 @@ class Converter:
 
         return False
 
-    def _solve(self, p: Placeholder, answer: IR):
+    def _run_with(self, x: IR, *env: tuple[Name, IR]):
+        if self.run_with:
+            return self.run_with(x, *env)
+        return Inliner(self.holes, self.globals).run_with(x, *env)
+
+    def _whnf(self, v: IR, delta: bool):
+        if self.whnf:
+            return self.whnf(v, delta)
+        return Inliner(self.holes, self.globals).whnf(v, delta)
+
+    def _solve(self, p: Placeholder, answer: IR, todo: list[tuple]):
         h = self.holes[p.id]
         if not h.answer.is_unsolved():
-            return self.eq(h.answer.value, answer)
+            todo.append((h.answer.value, answer))
+            return True
         h.answer.value = answer
+        self.solved.append(h)
 
         if isinstance(answer, Ref):
             for param in h.locals.values():
@@ -410,6 +972,7 @@ class Converter:
 
         return True
 
-    def _args(self, xs: list[IR], ys: list[IR]):
+    def _args(self, xs: list[IR], ys: list[IR], todo: list[tuple]):
         assert len(xs) == len(ys)
-        return all(self.eq(x, y) for x, y in zip(xs, ys))
+        todo += reversed(list(zip(xs, ys)))
+        return True
@@ -0,0 +1,239 @@
+from dataclasses import dataclass, field
+from functools import reduce as _r
+from typing import Callable, Optional, OrderedDict, cast as _c
+
+from . import Name, Param, Decl, Def, Sig, ir, db
+
+
+@dataclass(frozen=True, slots=True)
+class Val: ...
+
+
+@dataclass(frozen=True, slots=True)
+class Closure:
+    env: dict[int, Val]
+    name: Name
+    body: ir.IR
+    can_recurse: bool
+
+
+@dataclass(frozen=True, slots=True)
+class VType(Val): ...
+
+
+@dataclass(frozen=True, slots=True)
+class VFn(Val):
+    param: Param[Val]
+    body: Closure
+
+
+@dataclass(frozen=True, slots=True)
+class VFnType(Val):
+    param: Param[Val]
+    ret: Closure
+
+
+@dataclass(frozen=True, slots=True)
+class VData(Val):
+    name: Name
+    args: list[Val]
+
+
+@dataclass(frozen=True, slots=True)
+class VCtor(Val):
+    ty_name: Name
+    name: Name
+    args: list[Val]
+
+
+@dataclass(frozen=True, slots=True)
+class VLit(Val):
+    lit: ir.Lit
+
+
+@dataclass(frozen=True, slots=True)
+class VClass(Val):
+    name: Name
+    args: list[Val]
+
+
+@dataclass(frozen=True, slots=True)
+class Stuck:
+    arg: Val
+    cases: dict[int, ir.Case]
+    env: dict[int, Val]
+
+
+@dataclass(frozen=True, slots=True)
+class Neutral(Val):
+    head: ir.IR | Stuck | Val
+    spine: tuple[Val, ...] = ()
+
+
+@dataclass
+class Evaluator:
+    holes: OrderedDict[int, ir.Hole]
+    globals: dict[int, Decl]
+    can_recurse: bool = True
+    decls: db.Cache = field(default_factory=db.Cache)
+    instances: Optional[ir.InstanceCache] = None
+
+    def run(self, v: ir.IR) -> ir.IR:
+        return self.quote(self.eval(v, {}, self.can_recurse))
+
+    def run_with(self, x: ir.IR, *env: tuple[Name, ir.IR]):
+        e = {n.id: self.eval(v, {}, self.can_recurse) for n, v in env}
+        return self.quote(self.eval(x, e, self.can_recurse))
+
+    def whnf(self, v: ir.IR, delta=True):
+        if ir.is_whnf(v, self.holes, delta):
+            return v
+        return self.quote(self.eval(v, {}, delta and self.can_recurse))
+
+    def apply(self, f: ir.IR, *args: ir.IR):
+        ret = self.eval(f, {}, self.can_recurse)
+        for x in args:
+            ret = self._call(ret, self.eval(x, {}, self.can_recurse))
+        return self.quote(ret)
+
+    def eval(self, v: ir.IR, env: dict[int, Val], rec: bool) -> Val:
+        if isinstance(v, ir.Ref):
+            return env.get(v.name.id) or Neutral(v)
+        if isinstance(v, db.Var):
+            return env[v.name.id]
+        if isinstance(v, ir.Call):
+            if rec and (op := ir.native(self.globals, v)):
+                return self._native(op, v, env)
+            return self._call(self.eval(v.callee, env, rec), self.eval(v.arg, env, rec))
+        if isinstance(v, ir.Fn):
+            p = self._param(v.param, env, rec)
+            return VFn(p, Closure(env, v.param.name, v.body, rec))
+        if isinstance(v, ir.FnType):
+            p = self._param(v.param, env, rec)
+            return VFnType(p, Closure(env, v.param.name, v.ret, rec))
+        if isinstance(v, ir.Placeholder):
+            h = self.holes[v.id]
+            h.answer.type = self.run(h.answer.type)
+            if h.answer.is_unsolved():
+                return Neutral(v)
+            return self.eval(_c(ir.IR, h.answer.value), env, rec)
+        if isinstance(v, ir.Ctor):
+            return self._ctor(
+                v.ty_name, v.name, [self.eval(x, env, rec) for x in v.args]
+            )
+        if isinstance(v, ir.Data):
+            return VData(v.name, [self.eval(x, env, rec) for x in v.args])
+        if isinstance(v, ir.Match):
+            arg = self.eval(v.arg, env, rec)
+            if isinstance(arg, VLit):
+                c = arg.lit.unfold()
+                arg = VCtor(c.ty_name, c.name, [VLit(x) for x in c.args])
+            if not isinstance(arg, VCtor):
+                return Neutral(Stuck(arg, v.cases, env))
+            c = v.cases[arg.name.id]
+            env = {**env, **{p.name.id: x for p, x in zip(c.params, arg.args)}}
+            return self.eval(c.body, env, rec)
+        if isinstance(v, ir.Recur):
+            if rec:
+                d = self.globals[v.name.id]
+                if isinstance(d, Def):
+                    return self.eval(self.decls.closed(ir.from_def, d)[1][0], {}, rec)
+                assert isinstance(d, Sig)
+            return Neutral(v)
+        if isinstance(v, ir.Class):
+            return VClass(v.name, [self.eval(t, env, rec) for t in v.args])
+        if isinstance(v, ir.Field):
+            c = _c(ir.Class, self.quote(self.eval(v.type, env, rec)))
+            if c.is_unsolved():
+                return Neutral(ir.Field(v.name, c))
+            i = self._resolve_instance(c)
+            val = next(val for n, val in i.fields if _c(ir.Ref, n).name.id == v.name.id)
+            return self.eval(val, {}, rec)
+        if isinstance(v, ir.Type):
+            return VType()
+        if isinstance(v, ir.Lit):
+            return VLit(v)
+        assert isinstance(v, ir.Nomatch)
+        return Neutral(v)
+
+    def quote(self, v: Val) -> ir.IR:
+        if isinstance(v, VFn):
+            p, x = self._fresh(v.param)
+            return ir.Fn(p, self.quote(self._inst(v.body, x)))
+        if isinstance(v, VFnType):
+            p, x = self._fresh(v.param)
+            return ir.FnType(p, self.quote(self._inst(v.ret, x)))
+        if isinstance(v, VData):
+            return ir.Data(v.name, [self.quote(x) for x in v.args])
+        if isinstance(v, VCtor):
+            return ir.Ctor(v.ty_name, v.name, [self.quote(x) for x in v.args])
+        if isinstance(v, VClass):
+            return ir.Class(v.name, [self.quote(x) for x in v.args])
+        if isinstance(v, VLit):
+            return v.lit
+        if isinstance(v, Neutral):
+            head = v.head
+            if isinstance(head, Stuck):
+                head = self._quote_match(head)
+            elif isinstance(head, Val):
+                head = self.quote(head)
+            return _r(lambda f, x: ir.Call(f, self.quote(x)), v.spine, head)
+        assert isinstance(v, VType)
+        return ir.Type()
+
+    def _native(self, op: Callable[[int, int], int], v: ir.Call, env: dict[int, Val]):
+        f = _c(ir.Call, v.callee)
+        x, y = self.eval(f.arg, env, True), self.eval(v.arg, env, True)
+        if isinstance(x, VLit) and isinstance(y, VLit):
+            l = x.lit
+            return VLit(ir.Lit(l.ty_name, l.zero, l.succ, op(l.value, y.lit.value)))
+        return self._call(self._call(self.eval(f.callee, env, True), x), y)
+
+    def _ctor(self, ty_name: Name, name: Name, args: list[Val]):
+        if any(not isinstance(x, VLit) for x in args):
+            return VCtor(ty_name, name, args)
+        lits = [_c(VLit, x).lit for x in args]
+        v = ir.to_lit(self.globals, ir.Ctor(ty_name, name, lits))
+        return VLit(v) if isinstance(v, ir.Lit) else VCtor(ty_name, name, args)
+
+    def _call(self, f: Val, x: Val):
+        if isinstance(f, VFn):
+            return self._inst(f.body, x)
+        if isinstance(f, Neutral):
+            return Neutral(f.head, (*f.spine, x))
+        return Neutral(f, (x,))
+
+    def _inst(self, c: Closure, x: Val):
+        return self.eval(c.body, {**c.env, c.name.id: x}, c.can_recurse)
+
+    def _param(self, p: Param[ir.IR], env: dict[int, Val], rec: bool):
+        typ = self.eval(p.type, env, rec)
+        if p.is_class:
+            ty = _c(ir.Class, self.quote(typ))
+            if not ty.is_unsolved() and not self._resolve_instance(ty):
+                raise ir.NoInstanceError(str(ty), self.globals[ty.name.id].loc)
+        return Param(p.name, typ, p.is_implicit, p.is_class)
+
+    def _resolve_instance(self, c: ir.Class):
+        if self.instances:
+            return self.instances.resolve(self.holes, self.globals, c)
+        return ir.resolve_instance(self.holes, self.globals, c)
+
+    def _fresh(self, p: Param[Val]):
+        name = Name(p.name.text)
+        q = Param(name, self.quote(p.type), p.is_implicit, p.is_class)
+        return q, Neutral(ir.Ref(name))
+
+    def _quote_match(self, s: Stuck):
+        cases = {}
+        for i, c in s.cases.items():
+            env = s.env.copy()
+            params = []
+            for p in c.params:
+                q, x = self._fresh(self._param(p, env, False))
+                env[p.name.id] = x
+                params.append(q)
+            cases[i] = ir.Case(
+                c.ctor, params, self.quote(self.eval(c.body, env, False))
+            )
+        return ir.Match(self.quote(s.arg), cases)
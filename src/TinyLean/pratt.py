@@ -0,0 +1,351 @@
+import re
+from dataclasses import dataclass, field
+from functools import reduce
+from typing import Iterator, NoReturn
+
+from . import Name, Param, Decl, Def, Example, Ctor, Data, Field, Class, Instance
+from .ast import (
+    blocks,
+    Node,
+    Type,
+    Ref,
+    FnType,
+    Fn,
+    Call,
+    Placeholder,
+    Lit,
+    Nomatch,
+    Case,
+    Match,
+)
+
+_TOKEN = re.compile(
+    r"(?P<comment>/\-(?:[^-]|\-(?!/))*\-/)"
+    r"|(?P<white>[ \t\r\n]+)"
+    r"|(?P<id>[^\W\d]\w*)"
+    r"|(?P<num>[0-9]+)"
+    r"|(?P<sym>:=|≔|->|→|=>|↦|[(){}\[\]:|+\-*/])"
+)
+
+_OPS = {"+": ("add", 1), "-": ("sub", 1), "*": ("mul", 2), "/": ("div", 2)}
+
+_FUN = ("fun", "λ")
+
+
+class ParseError(Exception): ...
+
+
+@dataclass(frozen=True)
+class Token:
+    kind: str
+    text: str
+    loc: int
+    end: int
+    inline: bool
+
+    def __str__(self):
+        return "end of text" if self.kind == "eof" else repr(self.text)
+
+
+def tokenize(s: str, start=0, end=None) -> Iterator[Token]:
+    end = len(s) if end is None else end
+    loc, inline = start, True
+    while loc < end:
+        m = _TOKEN.match(s, loc, end)
+        if not m:
+            raise ParseError(f"Expected token, found {s[loc]!r}", loc)
+        kind = m.lastgroup
+        if kind == "white":
+            inline = inline and "\n" not in m.group()
+        elif kind == "comment":
+            inline = True
+        else:
+            yield Token(str(kind), m.group(), loc, m.end(), inline)
+            inline = True
+        loc = m.end()
+    yield Token("eof", "", end, end, inline)
+
+
+@dataclass
+class Reader:
+    tokens: Iterator[Token]
+    ahead: list[Token] = field(default_factory=list)
+    end: int = 0
+
+    def program(self) -> Iterator[tuple[int, Decl, int]]:
+        start = self._peek().loc
+        while self._peek().kind != "eof":
+            d = self.declaration()
+            yield start, d, self.end
+            start = self.end
+
+    def declaration(self) -> Decl:
+        t = self._peek()
+        if self._is("def"):
+            return self._def()
+        if self._is("example"):
+            return self._example()
+        if self._is("inductive"):
+            return self._data()
+        if self._is("class"):
+            return self._class()
+        if self._is("instance"):
+            return self._inst()
+        raise ParseError(f"Expected end of text, found {t}", t.loc)
+
+    def _def(self):
+        self._next()
+        r = self._ref()
+        params = self._params()
+        ret = self._return_type()
+        self._expect(":=", "≔")
+        return Def(r.loc, r.name, params, ret, self.expr())
+
+    def _example(self):
+        loc = self._next().loc
+        params = self._params()
+        ret = self._return_type()
+        self._expect(":=", "≔")
+        return Example(loc, params, ret, self.expr())
+
+    def _data(self):
+        loc = self._next().loc
+        r = self._ref()
+        params = self._params()
+        self._keyword("where")
+        ctors = []
+        while self._is("|"):
+            ctors.append(self._ctor())
+        self._keyword("open")
+        if self._ident().text != r.name.text:
+            raise ParseError("open and datatype name mismatch", loc)
+        return Data(r.loc, r.name, params, ctors)
+
+    def _ctor(self):
+        self._next()
+        r = self._ref()
+        params = self._params()
+        ty_args = []
+        while self._is("(") and self._at(1, "id") and self._is(":=", "≔", k=2):
+            self._next()
+            x = self._ref()
+            self._next()
+            v = self.expr()
+            self._expect(")")
+            ty_args.append((x, v))
+        return Ctor(r.loc, r.name, params, ty_args)
+
+    def _class(self):
+        loc = self._next().loc
+        r = self._ref()
+        params = self._params()
+        self._keyword("where")
+        fields = []
+        while self._at(0, "id") and self._is(":", k=1):
+            n = self._ref()
+            self._next()
+            fields.append(Field(n.loc, n.name, self.expr()))
+        self._keyword("open")
+        if self._ident().text != r.name.text:
+            raise ParseError("open and class name mismatch", loc)
+        return Class(r.loc, r.name, params, fields)
+
+    def _inst(self):
+        loc = self._next().loc
+        self._expect(":")
+        ty = self.expr()
+        self._keyword("where")
+        fields: list[tuple[Node, Node]] = []
+        while self._at(0, "id") and self._is(":=", "≔", k=1):
+            n = self._ref()
+            self._next()
+            fields.append((n, self.expr()))
+        return Instance(loc, ty, fields)
+
+    def _params(self):
+        ret = []
+        while self._is_param():
+            ret.append(self._param())
+        return ret
+
+    def _is_param(self):
+        return self._is("(", "{", "[") and self._at(1, "id") and self._is(":", k=2)
+
+    def _param(self):
+        open_ = self._next().text
+        n = self._ref().name
+        self._next()
+        typ = self.expr()
+        self._expect({"(": ")", "{": "}", "[": "]"}[open_])
+        return Param(n, typ, open_ != "(", open_ == "[")
+
+    def _return_type(self):
+        if self._is(":"):
+            self._next()
+            return self.expr()
+        return Placeholder(self._peek().loc, False)
+
+    def expr(self, prec=1) -> Node:
+        loc = self._peek().loc
+        lhs = self._atom()
+        while (t := self._peek()).kind == "sym" and t.text in _OPS:
+            op, p = _OPS[t.text]
+            if p < prec:
+                break
+            self._next()
+            rhs = self.expr(p + 1)
+            lhs = Call(loc, Call(loc, Ref(loc, Name(op)), lhs, False), rhs, False)
+        return lhs
+
+    def _atom(self) -> Node:
+        t = self._peek()
+        if self._is_param():
+            p = self._param()
+            self._expect("->", "→")
+            return FnType(t.loc, p, self.expr())
+        if t.kind == "num":
+            return Lit(self._next().loc, int(t.text))
+        if t.kind == "id" and t.text.startswith(_FUN):
+            return self._fn()
+        if self._is("match"):
+            return self._match()
+        if self._is("nomatch"):
+            self._next()
+            if not self._peek().inline:
+                self._fail("argument")
+            return Nomatch(t.loc, self._e_arg())
+        if t.kind == "id" or self._is("("):
+            callee = self._ref() if t.kind == "id" else self._p_expr()
+            if not self._is_arg():
+                return _keyword_atom(callee)
+            while self._is_arg():
+                if self._is("(") and self._at(1, "id") and self._is(":=", "≔", k=2):
+                    self._next()
+                    implicit = self._next().text
+                    self._next()
+                    arg = self.expr()
+                    self._expect(")")
+                    callee = Call(t.loc, callee, arg, implicit)
+                else:
+                    callee = Call(t.loc, callee, self._e_arg(), False)
+            return callee
+        self._fail("expression")
+
+    def _fn(self):
+        t = self._next()
+        names = []
+        head = t.text[1:] if t.text.startswith("λ") else t.text[3:]
+        if head:
+            names.append(Name(head))
+        while self._at(0, "id"):
+            names.append(Name(self._next().text))
+        if not names:
+            self._fail("name")
+        self._expect("=>", "↦")
+        return reduce(lambda a, n: Fn(t.loc, n, a), reversed(names), self.expr())
+
+    def _match(self):
+        loc = self._next().loc
+        if self._is("Type"):
+            arg: Node = Type(self._next().loc)
+        elif self._at(0, "id"):
+            arg = self._ref()
+        else:
+            arg = self._p_expr()
+        self._keyword("with")
+        if not self._is("|"):
+            self._fail("case")
+        cases = []
+        while self._is("|"):
+            self._next()
+            r = self._ref()
+            params = []
+            while self._at(0, "id"):
+                params.append(Name(self._next().text))
+            self._expect("=>", "↦")
+            cases.append(Case(r.loc, r, params, self.expr()))
+        return Match(loc, arg, cases)
+
+    def _is_arg(self):
+        t = self._peek()
+        return t.inline and (t.kind in ("id", "num") or self._is("("))
+
+    def _e_arg(self) -> Node:
+        if self._is("("):
+            return self._p_expr()
+        if self._at(0, "num"):
+            t = self._next()
+            return Lit(t.loc, int(t.text))
+        return _keyword_atom(self._ref())
+
+    def _p_expr(self):
+        self._expect("(")
+        ret = self.expr()
+        self._expect(")")
+        return ret
+
+    def _ref(self):
+        t = self._ident()
+        return Ref(t.loc, Name(t.text))
+
+    def _ident(self):
+        if not self._at(0, "id"):
+            self._fail("name")
+        return self._next()
+
+    def _keyword(self, w: str):
+        if not self._is(w):
+            self._fail(repr(w))
+        return self._next()
+
+    def _expect(self, *texts: str):
+        if not self._is(*texts):
+            self._fail(repr(texts[0]))
+        return self._next()
+
+    def _fail(self, what: str) -> NoReturn:
+        t = self._peek()
+        raise ParseError(f"Expected {what}, found {t}", t.loc)
+
+    def _at(self, k: int, kind: str):
+        return self._peek(k).kind == kind
+
+    def _is(self, *texts: str, k=0):
+        t = self._peek(k)
+        return t.kind != "eof" and t.text in texts
+
+    def _peek(self, k=0):
+        while len(self.ahead) <= k:
+            if self.ahead and self.ahead[-1].kind == "eof":
+                return self.ahead[-1]
+            self.ahead.append(next(self.tokens))
+        return self.ahead[k]
+
+    def _next(self):
+        t = self._peek()
+        if t.kind != "eof":
+            self.ahead.pop(0)
+            self.end = t.end
+        return t
+
+
+def _keyword_atom(r: Node):
+    if not isinstance(r, Ref):
+        return r
+    if r.name.text == "Type":
+        return Type(r.loc)
+    if r.name.text == "_":
+        return Placeholder(r.loc, True)
+    return r
+
+
+def located(s: str, is_markdown=False) -> Iterator[tuple[int, Decl, int]]:
+    if not is_markdown:
+        yield from Reader(tokenize(s)).program()
+        return
+    for start, end in blocks(s):
+        yield from Reader(tokenize(s, start, end)).program()
+
+
+def parse(s: str, is_markdown=False) -> list[Decl]:
+    return [d for _, d, _ in located(s, is_markdown)]
@@ -0,0 +1,104 @@
+import json
+import os
+import socket
+import stat
+from collections import OrderedDict
+from dataclasses import dataclass, field, asdict
+from pathlib import Path
+
+from . import ast
+from .diagnostics import Diagnostic, Source, diagnose
+
+
+@dataclass
+class Server:
+    capacity: int = 64
+    docs: OrderedDict[tuple[str, bool], ast.Incremental] = field(
+        default_factory=OrderedDict
+    )
+
+    def handle(self, req: dict) -> dict:
+        if "text" in req:
+            name = req.get("name", "<text>")
+            data = req["text"].encode()
+            md = bool(req.get("markdown", False))
+        else:
+            name = req["path"]
+            try:
+                data = Path(name).read_bytes()
+            except OSError as e:
+                return _response([Diagnostic(name, str(e))])
+            md = bool(req.get("markdown", name.endswith(".md")))
+        doc = self._doc(name, md)
+        src = Source(name, data)
+        d = diagnose(src, lambda: doc.check(src.text))
+        return _response([d] if d else [], reused=doc.reused, rechecked=doc.rechecked)
+
+    def _doc(self, name: str, md: bool):
+        key = name, md
+        if doc := self.docs.get(key):
+            self.docs.move_to_end(key)
+            return doc
+        doc = self.docs[key] = ast.Incremental(md)
+        while len(self.docs) > self.capacity:
+            self.docs.popitem(last=False)
+        return doc
+
+
+def _response(diagnostics: list[Diagnostic], **stats: int):
+    return {
+        "ok": not diagnostics,
+        "diagnostics": [asdict(d) for d in diagnostics],
+        **stats,
+    }
+
+
+if hasattr(socket, "AF_UNIX"):
+    from socketserver import StreamRequestHandler, UnixStreamServer
+
+    class _Handler(StreamRequestHandler):
+        server: "_UnixServer"
+
+        def handle(self):
+            for line in self.rfile:
+                try:
+                    ret = self.server.checker.handle(json.loads(line))
+                except (ValueError, KeyError, TypeError) as e:
+                    ret = {"ok": False, "error": f"bad request: {e!r}"}
+                except Exception as e:
+                    ret = {"ok": False, "error": f"internal compiler error: {e!r}"}
+                self.wfile.write(json.dumps(ret).encode() + b"\n")
+
+    class _UnixServer(UnixStreamServer):
+        def __init__(self, path: str):
+            super().__init__(path, _Handler)
+            self.checker = Server()
+
+
+def serve(path: str):
+    if not hasattr(socket, "AF_UNIX"):
+        raise OSError("--serve needs Unix domain sockets")
+    _unlink_stale(path)
+    with _UnixServer(path) as s:
+        try:
+            s.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(path)
+
+
+def _unlink_stale(path: str):
+    try:
+        st = os.lstat(path)
+    except FileNotFoundError:
+        return
+    if not stat.S_ISSOCK(st.st_mode):
+        raise FileExistsError(f"{path} exists and is not a socket")
+    with socket.socket(socket.AF_UNIX) as c:
+        try:
+            c.connect(path)
+        except ConnectionRefusedError:
+            os.unlink(path)
+            return
+    raise FileExistsError(f"{path} is in use by another server")
@@ -1,6 +1,11 @@
+from pathlib import Path
+from unittest import TestCase
+
 from pyparsing import ParserElement
 
-from .. import ast, grammar
+from .. import ast, Def, Example
+
+grammar = ast.grammar()
 
 
 def parse(g: ParserElement, text: str):
@@ -17,3 +22,24 @@ def resolve_md(s: str):
 
 def resolve_expr(s: str):
     return ast.NameResolver().expr(parse(grammar.expr, s)[0])
+
+
+def check_with(s: str, md=False, **opts):
+    return s | ast.Parser(md) | ast.NameResolver() | ast.TypeChecker(**opts)
+
+
+def bodies(ds):
+    return [str(d.body) for d in ds if isinstance(d, Def) or isinstance(d, Example)]
+
+
+def readme():
+    p = Path(__file__).parent / ".." / ".." / ".." / ".github" / "README.md"
+    with open(p, encoding="utf-8") as f:
+        return f.read()
+
+
+def assert_same_bodies(t: TestCase, text: str, md: bool, *checks):
+    want = bodies(ast.check_string(text, md))
+    for check in checks:
+        with t.subTest(check=check):
+            t.assertEqual(want, bodies(check(text, md)))
@@ -0,0 +1,27 @@
+from unittest import TestCase
+
+from .. import ast
+from ..benchmarks import nodes
+from ..benchmarks.__main__ import STAGES, measure
+from ..benchmarks.workloads import WORKLOADS, matches
+
+
+class TestBenchmarks(TestCase):
+    def test_workloads(self):
+        for name in WORKLOADS:
+            r = measure(name, 2, 1, "pyparsing")
+            self.assertNotIn("error", r)
+            self.assertTrue(all(r[s] >= 0 for s in STAGES))
+
+    def test_deep_source(self):
+        d = list(matches(64) | ast.Parser(backend="pratt"))[-1]
+        body, depth = d.body, 0
+        while isinstance(body, ast.Match):
+            body, depth = body.cases[-1].body, depth + 1
+        self.assertEqual(64, depth)
+        self.assertEqual("p64", body.name.text)
+
+    def test_nodes(self):
+        r = nodes.run(100, 1)
+        self.assertEqual(600, r["objects"])
+        self.assertGreater(r["bytes_per_object"], 0)
@@ -0,0 +1,64 @@
+import os
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, skipUnless
+from unittest.mock import patch
+
+from .. import ast, cache, fresh, Def
+from ..diagnostics import check_file
+
+TEXT = """
+inductive N where
+| Z
+| S (n: N)
+open N
+
+def add (n: N) (m: N): N :=
+  match n with
+  | Z => m
+  | S pred => S (add pred m)
+
+def two := add (S Z) (S Z)
+"""
+
+
+class TestCache(TestCase):
+    def test_roundtrip(self):
+        with TemporaryDirectory() as d:
+            root = Path(d) / "cache"
+            self.assertIsNone(cache.load(TEXT.encode(), False, root))
+            _check(Path(d), root)
+            self.assertTrue(cache.path_of(root, TEXT.encode(), False).exists())
+            with patch.object(ast, "check_all") as c:
+                _check(Path(d), root)
+                c.assert_not_called()
+            *_, two = cache.load(TEXT.encode(), False, root)
+            assert isinstance(two, Def)
+            self.assertEqual("(N.S (N.S N.Z))", str(two.body))
+            self.assertGreater(fresh(), two.name.id)
+
+    def test_invalidate(self):
+        with TemporaryDirectory() as d:
+            root = Path(d)
+            _check(root, root)
+            self.assertIsNone(cache.load((TEXT + "\n").encode(), False, root))
+            self.assertIsNone(cache.load(TEXT.encode(), True, root))
+            with patch.object(cache, "VERSION", "0.0.0-other"):
+                self.assertIsNone(cache.load(TEXT.encode(), False, root))
+            cache.path_of(root, TEXT.encode(), False).write_bytes(b"garbage")
+            self.assertIsNone(cache.load(TEXT.encode(), False, root))
+
+    @skipUnless(os.name == "posix", "needs POSIX permissions")
+    def test_shared_directory(self):
+        with TemporaryDirectory() as d:
+            root = Path(d)
+            _check(root, root)
+            root.chmod(0o777)
+            self.assertIsNone(cache.load(TEXT.encode(), False, root))
+
+
+def _check(d: Path, root: Path):
+    file = d / "a.lean"
+    file.write_text(TEXT)
+    with patch.dict(os.environ, {"TINYLEAN_CACHE_DIR": str(root)}):
+        assert check_file(file, cached=True) == []
@@ -647,6 +647,93 @@ class TestTypeChecker(TestCase):
         assert isinstance(e, Example)
         self.assertEqual("(N.S (N.S N.Z))", str(e.body))
 
+    def test_check_program_delayed_global(self):
+        const, f, _ = ast.check_string(
+            """
+            def const (a: Type) (b: Type): Type := a
+            def f (t: const Type ((x: Type) -> Type)): const Type Type := t
+            example: const Type Type := Type
+            """
+        )
+        assert isinstance(const, Def) and isinstance(f, Def)
+        self.assertEqual("((const Type) (x: Type) → Type)", str(f.params[0].type))
+        self.assertEqual("((const Type) Type)", str(f.ret))
+
+    def test_check_program_literal(self):
+        n, _, add, sub, mul, two, big, _, _ = ast.check_string(
+            """
+            inductive N where
+            | Z
+            | S (n: N)
+            open N
+
+            inductive Eq {T: Type} (a: T) (b: T) where
+            | Refl (a := b)
+            open Eq
+
+            def add (n: N) (m: N): N :=
+              match n with
+              | Z => m
+              | S k => S (add k m)
+
+            def sub (n: N) (m: N): N :=
+              match m with
+              | Z => n
+              | S k => match n with
+                | Z => Z
+                | S j => sub j k
+
+            def mul (n: N) (m: N): N :=
+              match n with
+              | Z => Z
+              | S k => add (mul k m) m
+
+            def two: N := S 1
+            def big: N := 1000 * 1000 - 1
+
+            example: Eq big 999999 := Refl (T := N)
+            example: Eq (3 - 5) Z := Refl (T := N)
+            """
+        )
+        assert isinstance(n, Data)
+        globals = {d.name.id: d for d in (n, add, sub, mul)}
+        ops = [ir.nat_op(globals, d.name) for d in (add, sub, mul, n)]
+        self.assertEqual(["add", "sub", "mul", None], ops)
+        assert isinstance(two, Def) and isinstance(big, Def)
+        self.assertEqual("(N.S (N.S N.Z))", str(two.body))
+        self.assertEqual(ir.Lit, type(big.body))
+        self.assertEqual(999999, big.body.value)
+
+    def test_check_program_literal_non_standard(self):
+        ast.check_string(
+            """
+            inductive N where
+            | Z
+            | S (n: N)
+            open N
+
+            inductive Eq {T: Type} (a: T) (b: T) where
+            | Refl (a := b)
+            open Eq
+
+            def add (n: N) (m: N): N :=
+              match n with
+              | Z => m
+              | S k => add k m
+
+            example: Eq (2 + 3) 3 := Refl (T := N)
+            """
+        )
+
+    def test_check_program_literal_failed(self):
+        text = "example: Type := 3"
+        with self.assertRaises(ast.TypeMismatchError) as e:
+            ast.check_string(text)
+        want, got, loc = e.exception.args
+        self.assertEqual("Type", want)
+        self.assertEqual("natural number", got)
+        self.assertEqual(text.index("3"), loc)
+
     def test_check_program_class(self):
         ast.check_string(
             """
@@ -814,3 +901,22 @@ class TestTypeChecker(TestCase):
         )
         assert isinstance(f, Def)
         self.assertEqual("(N.S (N.S N.Z))", str(f.body))
+
+    def test_check_all(self):
+        decls, errors = ast.check_all(
+            """
+            def a: Type := Type
+            def b: a := fun x => x
+            def c: a := b
+            def d := e
+            def f: Type := a
+            example := d
+            """
+        )
+        self.assertEqual(["a", "c", "f"], [str(d.name) for d in decls])
+        self.assertEqual(2, len(errors))
+        mismatch, undefined = errors
+        self.assertIsInstance(mismatch, ast.TypeMismatchError)
+        self.assertIsInstance(undefined, ast.UndefinedVariableError)
+        self.assertEqual("e", undefined.args[0])
+        self.assertLess(mismatch.args[-1], undefined.args[-1])
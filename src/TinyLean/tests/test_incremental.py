@@ -0,0 +1,97 @@
+from unittest import TestCase
+
+from .. import ast, Def, Class
+
+PRELUDE = """
+inductive N where
+| Z
+| S (n: N)
+open N
+
+def add (n: N) (m: N): N :=
+  match n with
+  | Z => m
+  | S pred => S (add pred m)
+
+def two := S (S Z)
+"""
+
+
+class TestIncremental(TestCase):
+    def test_unchanged(self):
+        i = ast.Incremental()
+        a = i.check(PRELUDE)
+        self.assertEqual((0, 3), (i.reused, i.rechecked))
+        b = i.check(PRELUDE)
+        self.assertEqual((3, 0), (i.reused, i.rechecked))
+        self.assertEqual([str(d.body) for d in a[1:]], [str(d.body) for d in b[1:]])
+
+    def test_append(self):
+        i = ast.Incremental()
+        i.check(PRELUDE)
+        *_, f = i.check(PRELUDE + "def f := add two two")
+        self.assertEqual((3, 1), (i.reused, i.rechecked))
+        assert isinstance(f, Def)
+        self.assertEqual("(N.S (N.S (N.S (N.S N.Z))))", str(f.body))
+        *_, g = i.check(PRELUDE + "def g := add two (S Z)")
+        self.assertEqual((3, 1), (i.reused, i.rechecked))
+        assert isinstance(g, Def)
+        self.assertEqual("(N.S (N.S (N.S N.Z)))", str(g.body))
+
+    def test_dependents(self):
+        text = PRELUDE + "def one := S Z\ndef f := add two one\n"
+        i = ast.Incremental()
+        i.check(text)
+        edited = text.replace("def two := S (S Z)", "def two := S (S (S Z))")
+        _, _, two, one, f = i.check(edited)
+        self.assertEqual((3, 2), (i.reused, i.rechecked))
+        assert isinstance(one, Def) and isinstance(f, Def)
+        self.assertEqual(edited.index("one :="), one.loc)
+        self.assertEqual("(N.S (N.S (N.S (N.S N.Z))))", str(f.body))
+
+    def test_removed(self):
+        i = ast.Incremental()
+        i.check(PRELUDE + "def f := two")
+        with self.assertRaises(ast.UndefinedVariableError) as e:
+            i.check(PRELUDE.replace("def two := S (S Z)", "") + "def f := two")
+        self.assertEqual("two", e.exception.args[0])
+        i.check(PRELUDE + "def f := two")
+        self.assertEqual((4, 0), (i.reused, i.rechecked))
+
+    def test_instance(self):
+        text = """
+        class Default (T: Type) where
+            default: T
+        open Default
+
+        instance: Default Type
+        where
+            default := Type
+
+        def d := default Type
+        def e := Type
+        """
+        i = ast.Incremental()
+        i.check(text)
+        c, _, d, _ = i.check(text.replace(":= Type\n\n", ":= (a: Type) -> Type\n\n"))
+        self.assertEqual((2, 2), (i.reused, i.rechecked))
+        assert isinstance(c, Class) and isinstance(d, Def)
+        self.assertEqual(1, len(c.instances))
+        self.assertEqual("(a: Type) → Type", str(d.body))
+
+    def test_reordered(self):
+        i = ast.Incremental()
+        i.check("def a := Type\ndef b := a\n")
+        with self.assertRaises(ast.UndefinedVariableError) as e:
+            i.check("def b := a\ndef a := Type\n")
+        self.assertEqual("a", e.exception.args[0])
+
+    def test_tabs(self):
+        text = "\t\t\t\tdef b (s: Type) (t: Type): Type := s\ndef c := b Type\n"
+        i = ast.Incremental()
+        i.check(text)
+        self.assertEqual(text.strip().split("\n"), [e.chunk for e in i.entries])
+        _, c = i.check(text.replace("(s: Type) (t: Type)", "(t: Type) (s: Type)"))
+        self.assertEqual((0, 2), (i.reused, i.rechecked))
+        assert isinstance(c, Def)
+        self.assertEqual("λ (s: Type) ↦ s", str(c.body))
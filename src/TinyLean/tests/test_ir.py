@@ -0,0 +1,505 @@
+from collections import OrderedDict
+from unittest import TestCase
+from unittest.mock import patch
+
+from .. import ast, ir, db, Name, Param, Def, Data, Class, Instance
+
+
+class TestInterner(TestCase):
+    def test_intern(self):
+        n, a, b = Name("N"), Name("a"), Name("b")
+        nat = lambda: ir.Data(n, [])
+        ty = lambda: ir.FnType(
+            Param(a, nat(), False), ir.FnType(Param(b, nat(), False), nat())
+        )
+        i = ir.Interner()
+        x, y = i.run(ty()), i.run(ty())
+        self.assertIs(x, y)
+        assert isinstance(x, ir.FnType)
+        self.assertIs(x.param.type, x.ret.param.type)
+        self.assertIs(x, i.run(x))
+
+    def test_intern_alpha(self):
+        n = Name("N")
+        nat = lambda: ir.Data(n, [])
+        ty = lambda a, b, r: ir.FnType(
+            Param(a, nat(), False), ir.FnType(Param(b, nat(), False), ir.Ref(r))
+        )
+        i = ir.Interner()
+        x = i.run(ty(a := Name("a"), Name("b"), a))
+        self.assertIs(x, i.run(ty(a := Name("a"), Name("b"), a)))
+        self.assertIsNot(x, i.run(ty(Name("a"), b := Name("b"), b)))
+        self.assertIsNot(x, i.run(ty(c := Name("c"), Name("b"), c)))
+
+    def test_intern_free(self):
+        t = lambda x: ir.Fn(Param(Name("a"), ir.Type(), False), ir.Ref(x))
+        i = ir.Interner()
+        x, y = Name("x"), Name("y")
+        self.assertIs(i.run(t(x)), i.run(t(x)))
+        self.assertIsNot(i.run(t(x)), i.run(t(y)))
+        a = Name("a")
+        f = i.run(ir.Fn(Param(a, ir.Type(), False), ir.Ref(a)))
+        self.assertIsNot(f, i.run(t(a)))
+
+    def test_intern_no_self_shadow(self):
+        t = lambda y: Param(y, ir.Type(), False)
+        i = ir.Interner()
+        f = i.run(ir.Fn(t(y := Name("y")), ir.Ref(y)))
+        inner = ir.Fn(t(z := Name("y")), ir.Ref(z))
+        g = i.run(ir.Fn(t(y), ir.Call(ir.Ref(y), inner)))
+        assert isinstance(g, ir.Fn) and isinstance(g.body, ir.Call)
+        self.assertIsNot(f, g.body.arg)
+        self.assertIs(f, i.run(ir.Call(ir.Type(), inner)).arg)
+
+    def test_intern_nomatch(self):
+        i = ir.Interner()
+        self.assertIsNot(i.run(ir.Nomatch()), i.run(ir.Nomatch()))
+        x = lambda: ir.Call(ir.Ref(Name("p")), ir.Nomatch())
+        self.assertIsNot(i.run(x()), i.run(x()))
+
+    def test_eq_identity(self):
+        holes = OrderedDict()
+        p = ast.TypeChecker(holes=holes)._insert_hole(0, False, ir.Type())
+        self.assertTrue(ir.Converter(holes, {}).eq(p, p))
+        self.assertTrue(holes[p.id].answer.is_unsolved())
+
+    def test_check_program_shared_types(self):
+        _, add = ast.check_string(
+            """
+            inductive N where
+            | Z
+            | S (n: N)
+            open N
+
+            def add (a: N) (b: N): N := a
+            """
+        )
+        assert isinstance(add, Def)
+        a, b = add.params
+        self.assertIs(a.type, b.type)
+        self.assertIs(a.type, add.ret)
+
+    def test_check_program_shared_alpha(self):
+        checker = ast.TypeChecker()
+        text = """
+        inductive N where
+        | Z
+        | S (n: N)
+        open N
+
+        def f (a: N) (b: N): N := a
+        def g (a: N) (b: N): N := b
+        """
+        _, f, g = text | ast.Parser() | ast.NameResolver() | checker
+        assert isinstance(f, Def) and isinstance(g, Def)
+        i = checker.interner
+        self.assertIs(i.run(ir.from_def(f)[1]), i.run(ir.from_def(g)[1]))
+        self.assertIsNot(i.run(ir.from_def(f)[0]), i.run(ir.from_def(g)[0]))
+
+    def test_inline_shared_binder(self):
+        a, z, pair = Name("a"), ir.Ref(Name("z")), ir.Ref(Name("pair"))
+        f = ir.Fn(Param(a, ir.Type(), False), ir.Ref(a))
+        v = ir.Inliner(OrderedDict(), {}).run(ir.Call(ir.Call(pair, ir.Call(f, z)), f))
+        self.assertEqual("((pair z) λ (a: Type) ↦ a)", str(v))
+
+
+class TestDeBruijn(TestCase):
+    def test_to_db(self):
+        a, b, t = Name("a"), Name("b"), Name("T")
+        v = ir.Fn(
+            Param(a, ir.Ref(t), False),
+            ir.Fn(Param(b, ir.Ref(t), False), ir.Call(ir.Ref(a), ir.Ref(b))),
+        )
+        c = db.to_db(v)
+        assert isinstance(c, ir.Fn) and isinstance(c.body, ir.Fn)
+        self.assertEqual(ir.Ref(t), c.param.type)
+        self.assertEqual(ir.Call(db.Var(1, a), db.Var(0, b)), c.body.body)
+        self.assertEqual(str(v), str(c))
+
+    def test_from_db(self):
+        a = Name("a")
+        v = ir.FnType(Param(a, ir.Type(), False), ir.Ref(a))
+        x, y = db.from_db(db.to_db(v)), db.from_db(db.to_db(v))
+        self.assertEqual(str(v), str(x))
+        assert isinstance(x, ir.FnType) and isinstance(y, ir.FnType)
+        self.assertNotEqual(a.id, x.param.name.id)
+        self.assertNotEqual(x.param.name.id, y.param.name.id)
+        self.assertEqual(ir.Ref(x.param.name), x.ret)
+
+    def test_from_db_case(self):
+        n, m = Name("n"), Name("m")
+        ps = [Param(n, ir.Type(), False), Param(m, ir.Ref(n), False)]
+        v = ir.Match(ir.Ref(Name("x")), {1: ir.Case(Name("C"), ps, ir.Ref(n))})
+        c = db.to_db(v)
+        assert isinstance(c, ir.Match)
+        self.assertEqual(db.Var(0, n), c.cases[1].params[1].type)
+        self.assertEqual(db.Var(1, n), c.cases[1].body)
+        o = db.from_db(c)
+        assert isinstance(o, ir.Match)
+        p, q = o.cases[1].params
+        self.assertEqual(ir.Ref(p.name), q.type)
+        self.assertEqual(ir.Ref(p.name), o.cases[1].body)
+
+    def test_check_program_shared_unfold(self):
+        checker = ast.TypeChecker(nbe=True)
+        _, add, e = (
+            """
+            inductive N where
+            | Z
+            | S (n: N)
+            open N
+
+            def add (n: N) (m: N): N :=
+              match n with
+              | Z => m
+              | S pred => S (add pred m)
+
+            example := add (S (S Z)) (S Z)
+            """
+            | ast.Parser()
+            | ast.NameResolver()
+            | checker
+        )
+        self.assertEqual("(N.S (N.S (N.S N.Z)))", str(e.body))
+        (d,), (v, _), _ = checker.decls.entries[(ir.from_def, add.name.id)]
+        self.assertIs(add, d)
+        assert isinstance(v, ir.Fn) and isinstance(v.body, ir.Fn)
+        assert isinstance(v.body.body, ir.Match)
+        arg = v.body.body.arg
+        assert isinstance(arg, db.Var)
+        self.assertEqual((1, "n"), (arg.idx, arg.name.text))
+
+
+class TestCache(TestCase):
+    def test_cache(self):
+        n, a = Name("N"), Name("a")
+        d = Def(0, Name("f"), [Param(a, ir.Data(n, []), False)], ir.Type(), ir.Ref(a))
+        c = db.Cache()
+        v1, t1 = c.get(ir.from_def, d)
+        v2, t2 = c.get(ir.from_def, d)
+        self.assertEqual((1, 1), (c.misses, c.hits))
+        self.assertEqual(0.5, c.hit_rate())
+        assert isinstance(v1, ir.Fn) and isinstance(v2, ir.Fn)
+        self.assertNotEqual(v1.param.name.id, v2.param.name.id)
+        self.assertEqual(ir.Ref(v2.param.name), v2.body)
+        self.assertIs(v1.param.type, v2.param.type)
+        self.assertEqual(str(t1), str(t2))
+
+    def test_cache_invalidate(self):
+        f, a = Name("f"), Name("a")
+        d1 = Def(0, f, [Param(a, ir.Type(), False)], ir.Type(), ir.Ref(a))
+        d2 = Def(0, f, [Param(a, ir.Type(), False)], ir.Type(), ir.Type())
+        c = db.Cache()
+        c.get(ir.from_def, d1)
+        v, _ = c.get(ir.from_def, d2)
+        self.assertEqual((2, 0), (c.misses, c.hits))
+        assert isinstance(v, ir.Fn)
+        self.assertEqual(ir.Type(), v.body)
+
+    def test_check_program_hits(self):
+        checker = ast.TypeChecker()
+        """
+        inductive N where
+        | Z
+        | S (n: N)
+        open N
+
+        example := S (S (S (S Z)))
+        """ | ast.Parser() | ast.NameResolver() | checker
+        self.assertEqual(3, checker.decls.misses)
+        self.assertEqual(3, checker.decls.hits)
+
+
+class TestInstanceIndex(TestCase):
+    def test_candidates(self):
+        cls, a, b, _, _, i_b, d = ast.check_string(
+            """
+            class Default (T: Type) where
+                default: T
+            open Default
+
+            inductive A where
+            | MkA
+            open A
+
+            inductive B where
+            | MkB
+            open B
+
+            instance: Default A
+            where
+                default := MkA
+
+            instance: Default Type
+            where
+                default := A
+
+            instance: Default B
+            where
+                default := MkB
+
+            def d := default B
+            """
+        )
+        assert isinstance(cls, Class) and isinstance(d, Def)
+        assert isinstance(a, Data) and isinstance(b, Data)
+        self.assertEqual("B.MkB", str(d.body))
+        self.assertEqual(3, len(cls.instances))
+        q = lambda v: ir._candidates(cls, ir.Class(cls.name, [v]))
+        self.assertEqual([i_b.id], q(ir.Data(b.name, [])))
+        self.assertEqual([], q(ir.Ctor(a.name, a.ctors[0].name, [])))
+        self.assertEqual(cls.instances, q(ir.Ref(Name("T"))))
+
+
+class TestInstanceCache(TestCase):
+    def test_resolve(self):
+        checker = ast.TypeChecker()
+        cls, b, i, _, _ = (
+            """
+            class Default (T: Type) where
+                default: T
+            open Default
+
+            inductive B where
+            | MkB
+            open B
+
+            instance: Default B
+            where
+                default := MkB
+
+            def d1 := default B
+            def d2 := default B
+            """
+            | ast.Parser()
+            | ast.NameResolver()
+            | checker
+        )
+        assert isinstance(cls, Class) and isinstance(b, Data)
+        self.assertEqual(1, checker.instances.misses)
+        hits = checker.instances.hits
+        self.assertGreater(hits, 1)
+        q = ir.Class(cls.name, [ir.Data(b.name, [])])
+        self.assertIs(i, checker.instances.resolve(checker.holes, checker.globals, q))
+        self.assertEqual(hits + 1, checker.instances.hits)
+
+    def test_resolve_negative(self):
+        checker = ast.TypeChecker()
+        cls, a, b, i = (
+            """
+            class C (T: Type) where open C
+            inductive A where open A
+            inductive B where open B
+            instance: C B
+            where
+            """
+            | ast.Parser()
+            | ast.NameResolver()
+            | checker
+        )
+        assert isinstance(cls, Class) and isinstance(a, Data)
+        cache, holes, globals = checker.instances, checker.holes, checker.globals
+        q = lambda: ir.Class(cls.name, [ir.Data(a.name, [])])
+        self.assertIsNone(cache.resolve(holes, globals, q()))
+        self.assertIsNone(cache.resolve(holes, globals, q()))
+        self.assertEqual((1, 1), (cache.misses, cache.hits))
+        j = Instance(0, q(), [])
+        globals[j.id] = j
+        ir.add_instance(cls, j)
+        self.assertIs(j, cache.resolve(holes, globals, q()))
+        self.assertEqual((2, 1), (cache.misses, cache.hits))
+
+    def test_resolve_unsolved(self):
+        checker = ast.TypeChecker()
+        (cls,) = (
+            "class C (T: Type) where open C"
+            | ast.Parser()
+            | ast.NameResolver()
+            | checker
+        )
+        assert isinstance(cls, Class)
+        p = checker._insert_hole(0, False, ir.Type())
+        q = ir.Class(cls.name, [ir.Data(Name("D"), [p])])
+        self.assertIsNone(checker.instances.resolve(checker.holes, checker.globals, q))
+        self.assertEqual({}, checker.instances.resolved)
+
+
+def _nat(n: int, t=Name("N"), s=Name("S"), z=Name("Z")) -> ir.IR:
+    v: ir.IR = ir.Ctor(t, z, [])
+    for _ in range(n):
+        v = ir.Ctor(t, s, [v])
+    return v
+
+
+class TestDeepTerms(TestCase):
+    def test_rename(self):
+        x = Name("x")
+        v: ir.IR = ir.Ref(x)
+        for _ in range(10000):
+            v = ir.Call(ir.Fn(Param(x, ir.Type(), False), v), _nat(1))
+        r = ir.Renamer().run(v)
+        assert isinstance(r, ir.Call) and isinstance(r.callee, ir.Fn)
+        self.assertNotEqual(x.id, r.callee.param.name.id)
+        while isinstance(r, ir.Call):
+            assert isinstance(r.callee, ir.Fn)
+            p, r = r.callee.param, r.callee.body
+        self.assertEqual(ir.Ref(p.name), r)
+
+    def test_eq(self):
+        a, b = _nat(10000), _nat(10000)
+        self.assertTrue(ir.Converter(OrderedDict(), {}).eq(a, b))
+        self.assertFalse(ir.Converter(OrderedDict(), {}).eq(a, _nat(9999)))
+
+    def test_str(self):
+        s = str(_nat(10000))
+        self.assertTrue(s.startswith("(N.S (N.S "))
+        self.assertTrue(s.endswith(" N.Z" + ")" * 10000))
+        self.assertEqual(10000, s.count("N.S"))
+
+
+class TestConverter(TestCase):
+    def test_lazy(self):
+        f = Name("f")
+        a, b = _nat(200), _nat(200)
+        with patch.object(ir.Inliner, "run") as run:
+            c = ir.Converter(OrderedDict(), {})
+            self.assertTrue(c.eq(ir.Call(ir.Ref(f), a), ir.Call(ir.Ref(f), b)))
+            run.assert_not_called()
+
+    def test_beta(self):
+        x, y = Name("x"), Name("y")
+        redex = ir.Call(ir.Fn(Param(x, ir.Type(), False), ir.Ref(x)), ir.Ref(y))
+        self.assertTrue(ir.Converter(OrderedDict(), {}).eq(redex, ir.Ref(y)))
+        self.assertTrue(ir.Converter(OrderedDict(), {}).eq(ir.Ref(y), redex))
+
+    def test_rollback(self):
+        holes = OrderedDict()
+        t = Name("T")
+        for i in (1, 2):
+            holes[i] = ir.Hole(0, False, {}, ir.Answer(ir.Type()))
+        lhs = ir.Data(t, [ir.Placeholder(1, False), ir.Type()])
+        rhs = ir.Data(t, [ir.Type(), ir.Placeholder(2, False)])
+        self.assertTrue(ir.Converter(holes, {}).eq(lhs, rhs))
+        self.assertFalse(holes[1].answer.is_unsolved())
+        holes[1].answer.value = holes[2].answer.value = None
+        rhs = ir.Data(t, [ir.Type(), ir.Ref(t)])
+        self.assertFalse(ir.Converter(holes, {}).eq(lhs, rhs))
+        self.assertTrue(holes[1].answer.is_unsolved())
+
+    def test_lit(self):
+        n, z, s_ = Name("N"), Name("Z"), Name("S")
+        two = ir.Lit(n, z, s_, 2)
+        self.assertEqual("(N.S (N.S N.Z))", str(two))
+        one = ir.Ctor(n, s_, [ir.Ctor(n, z, [])])
+        c = ir.Converter(OrderedDict(), {})
+        self.assertTrue(c.eq(ir.Ctor(n, s_, [one]), two))
+        self.assertFalse(c.eq(two, one))
+
+    def test_shared_binder(self):
+        a, b, x = Name("a"), Name("b"), Name("x")
+        p = Param(x, ir.Type(), False)
+        c = ir.Converter(OrderedDict(), {})
+        self.assertTrue(c.eq(ir.FnType(p, ir.Ref(x)), ir.FnType(p, ir.Ref(x))))
+        self.assertFalse(c.eq(ir.Fn(p, ir.Ref(a)), ir.Fn(p, ir.Ref(b))))
+
+
+class TestInliner(TestCase):
+    def test_share(self):
+        t, f, x = Name("T"), Name("f"), Name("x")
+        arg = ir.Call(ir.Ref(f), ir.Type())
+        i = ir.Inliner(OrderedDict(), {})
+        run = ir.Inliner.run
+        with patch.object(ir.Inliner, "run", autospec=True, side_effect=run) as m:
+            v = i.run_with(ir.Data(t, [ir.Ref(x), ir.Ref(x)]), (x, arg))
+        self.assertEqual(ir.Data(t, [arg, arg]), v)
+        self.assertEqual(
+            1, sum(isinstance(c.args[1], ir.Call) for c in m.call_args_list)
+        )
+        self.assertEqual({}, i.env)
+
+    def test_share_forced(self):
+        t, x, y = Name("T"), Name("x"), Name("y")
+        arg = ir.Fn(Param(y, ir.Type(), False), ir.Ref(y))
+        i = ir.Inliner(OrderedDict(), {})
+        rename = ir.Renamer.run
+        with patch.object(ir.Renamer, "run", autospec=True, side_effect=rename) as m:
+            v = i.run_with(ir.Data(t, [ir.Ref(x)] * 3), (x, arg))
+        assert isinstance(v, ir.Data)
+        self.assertEqual(1, m.call_count)
+        self.assertIs(v.args[0], v.args[1])
+        self.assertIs(v.args[0], v.args[2])
+
+    def test_selected_case(self):
+        n, z, s_, m = Name("N"), Name("Z"), Name("S"), Name("m")
+        cases = {
+            z.id: ir.Case(z, [], ir.Type()),
+            s_.id: ir.Case(s_, [Param(m, ir.Data(n, []), False)], ir.Ref(m)),
+        }
+        i = ir.Inliner(OrderedDict(), {})
+        with patch.object(ir.Inliner, "_case") as case:
+            self.assertEqual(ir.Type(), i.run(ir.Match(ir.Ctor(n, z, []), cases)))
+            case.assert_not_called()
+        stuck = i.run(ir.Match(ir.Ref(m), cases))
+        self.assertIsInstance(stuck, ir.Match)
+        self.assertEqual(2, len(stuck.cases))
+
+    def test_native_args_once(self):
+        n, add = ast.check_string(
+            """
+            inductive N where
+            | Z
+            | S (n: N)
+            open N
+
+            def add (n: N) (m: N): N :=
+              match n with
+              | Z => m
+              | S k => S (add k m)
+            """
+        )
+        a, x = Name("a"), Name("x")
+        arg = ir.Call(ir.Fn(Param(x, ir.Data(n.name, []), False), ir.Ref(x)), ir.Ref(a))
+        v = ir.Call(
+            ir.Call(ir.Recur(add.name), arg),
+            ir.Lit(n.name, *[c.name for c in n.ctors], 1),
+        )
+        i = ir.Inliner(OrderedDict(), {d.name.id: d for d in (n, add)})
+        run = ir.Inliner.run
+        with patch.object(ir.Inliner, "run", autospec=True, side_effect=run) as m:
+            ret = i.run(v)
+        self.assertIsInstance(ret, ir.Match)
+        self.assertEqual(1, sum(c.args[1] is arg for c in m.call_args_list))
+
+
+class TestWhnf(TestCase):
+    def test_head_only(self):
+        x, n = Name("x"), Name("n")
+        stuck = ir.Match(ir.Ref(n), {})
+        v = ir.Ctor(Name("N"), Name("S"), [stuck])
+        holes = OrderedDict()
+        self.assertIs(v, ir.Inliner(holes, {}).whnf(v))
+        self.assertTrue(ir.is_whnf(v, holes))
+        holes[1] = ir.Hole(0, False, {}, ir.Answer(ir.Type()))
+        holes[1].answer.value = ir.Fn(Param(x, ir.Type(), False), ir.Ref(x))
+        redex = ir.Call(ir.Placeholder(1, False), v)
+        self.assertFalse(ir.is_whnf(redex, holes))
+        self.assertEqual(str(v), str(ir.Inliner(holes, {}).whnf(redex)))
+
+    def test_lazy_body(self):
+        n, z, x, y, m = Name("N"), Name("Z"), Name("x"), Name("y"), Name("m")
+        cases = {z.id: ir.Case(z, [], ir.Ref(x))}
+        body = ir.Fn(Param(y, ir.Type(), False), ir.Match(ir.Ref(m), cases))
+        redex = ir.Call(ir.Fn(Param(x, ir.Type(), False), body), ir.Type())
+        with patch.object(ir.Inliner, "_case") as case:
+            v = ir.Inliner(OrderedDict(), {}).whnf(redex)
+            case.assert_not_called()
+        assert isinstance(v, ir.Fn) and isinstance(v.body, ir.Match)
+        self.assertEqual("match m with | Z ↦ Type", str(v.body))
+
+    def test_delta(self):
+        f, a = Name("f"), Name("a")
+        d = Def(0, f, [Param(a, ir.Type(), False)], ir.Type(), ir.Ref(a))
+        v = ir.Call(ir.Recur(f), ir.Type())
+        inliner = ir.Inliner(OrderedDict(), {f.id: d})
+        self.assertIs(v, inliner.whnf(v, False))
+        self.assertEqual(ir.Type(), inliner.whnf(v))
@@ -1,4 +1,9 @@
+import json
+import os
+import subprocess
+import sys
 from pathlib import Path
+from tempfile import TemporaryDirectory
 from unittest import TestCase
 
 from .. import ast, ir
@@ -190,3 +195,135 @@ Footer.
             def f := (S Z) + (S Z)
             """
         )
+
+    def test_cli_error_location(self):
+        with TemporaryDirectory() as d:
+            file = Path(d) / "a.lean"
+            file.write_text("def a := Type\n\nexample := b\n", encoding="utf-8")
+            r = subprocess.run(
+                [sys.executable, "-m", "TinyLean", str(file)],
+                capture_output=True,
+                text=True,
+                cwd=Path(__file__).parent / ".." / "..",
+            )
+            self.assertEqual(1, r.returncode)
+            self.assertEqual(f"{file}:3:12: undefined variable 'b'\n", r.stdout)
+
+    def test_cli_crlf_markdown(self):
+        with TemporaryDirectory() as d:
+            file = Path(d) / "a.md"
+            file.write_bytes(b"# A\r\n\r\n```lean\r\nexample := foo\r\n```\r\n")
+            r = subprocess.run(
+                [sys.executable, "-m", "TinyLean", str(file)],
+                capture_output=True,
+                text=True,
+                cwd=Path(__file__).parent / ".." / "..",
+            )
+            self.assertEqual(1, r.returncode)
+            self.assertEqual(f"{file}:4:12: undefined variable 'foo'\n", r.stdout)
+
+    def test_cli_json(self):
+        with TemporaryDirectory() as d:
+            file = Path(d) / "a.lean"
+            file.write_text("example := b\n\nexample := c\n", encoding="utf-8")
+            r = subprocess.run(
+                [sys.executable, "-m", "TinyLean", "--json", str(file)],
+                capture_output=True,
+                encoding="utf-8",
+                cwd=Path(__file__).parent / ".." / "..",
+            )
+            self.assertEqual(1, r.returncode)
+            self.assertEqual(
+                [
+                    dict(
+                        file=str(file), message="undefined variable 'b'", line=1, col=12
+                    ),
+                    dict(
+                        file=str(file), message="undefined variable 'c'", line=3, col=12
+                    ),
+                ],
+                json.loads(r.stdout),
+            )
+
+    def test_cli_empty(self):
+        with TemporaryDirectory() as d:
+            file = Path(d) / "a.lean"
+            file.touch()
+            r = subprocess.run(
+                [sys.executable, "-m", "TinyLean", str(file)],
+                capture_output=True,
+                cwd=Path(__file__).parent / ".." / "..",
+            )
+            self.assertEqual(0, r.returncode)
+
+    def test_cli_batch(self):
+        with TemporaryDirectory() as d:
+            (Path(d) / "sub").mkdir()
+            (Path(d) / "a.lean").write_text("def a := Type\n", encoding="utf-8")
+            (Path(d) / "sub" / "b.lean").write_text("example := b\n", encoding="utf-8")
+            (Path(d) / "sub" / "c.md").write_text("```lean\ndef c := Type\n```\n")
+            (Path(d) / "sub" / "d.txt").write_text("garbage")
+            r = subprocess.run(
+                [sys.executable, "-m", "TinyLean", "-j", "2", d],
+                capture_output=True,
+                text=True,
+                cwd=Path(__file__).parent / ".." / "..",
+            )
+            self.assertEqual(1, r.returncode)
+            out = r.stdout.splitlines()
+            b = Path(d) / "sub" / "b.lean"
+            self.assertIn(f"{b}:1:12: undefined variable 'b'", out)
+            self.assertTrue(any(l.endswith(f"ok    {Path(d) / 'a.lean'}") for l in out))
+            self.assertTrue(any(l.endswith(f"FAIL  {b}") for l in out))
+            self.assertRegex(out[-1], r"^3 files, 1 failed in \d+\.\d+s$")
+
+    def test_cli_syntax_error(self):
+        with TemporaryDirectory() as d:
+            file = Path(d) / "a.lean"
+            file.write_text("def a := (\n", encoding="utf-8")
+            r = subprocess.run(
+                [sys.executable, "-m", "TinyLean", str(file)],
+                capture_output=True,
+                text=True,
+                cwd=Path(__file__).parent / ".." / "..",
+            )
+            self.assertEqual(1, r.returncode)
+            self.assertTrue(r.stdout.startswith(f"{file}:2:1: Expected"))
+
+    def test_cli_cache(self):
+        with TemporaryDirectory() as d:
+            file = Path(d) / "a.lean"
+            file.write_text("def a := Type\n", encoding="utf-8")
+            root = Path(d) / "cache"
+            for args in ([], ["--cache"]):
+                r = subprocess.run(
+                    [sys.executable, "-m", "TinyLean", *args, str(file)],
+                    capture_output=True,
+                    text=True,
+                    cwd=Path(__file__).parent / ".." / "..",
+                    env={**os.environ, "TINYLEAN_CACHE_DIR": str(root)},
+                )
+                self.assertEqual(0, r.returncode)
+                self.assertEqual(bool(args), root.exists())
+            self.assertEqual([], list(Path(d).glob("*.tlc")))
+            r = subprocess.run(
+                [sys.executable, "-X", "importtime", "-m", "TinyLean", "--cache", file],
+                capture_output=True,
+                text=True,
+                cwd=Path(__file__).parent / ".." / "..",
+                env={**os.environ, "TINYLEAN_CACHE_DIR": str(root)},
+            )
+            self.assertEqual(0, r.returncode)
+            self.assertNotIn("pyparsing", r.stderr)
+
+    def test_import_time(self):
+        for args in (["-c", "import TinyLean.ast"], ["-m", "TinyLean", "--version"]):
+            r = subprocess.run(
+                [sys.executable, "-X", "importtime", *args],
+                capture_output=True,
+                text=True,
+                cwd=Path(__file__).parent / ".." / "..",
+            )
+            self.assertEqual(0, r.returncode)
+            self.assertIn("TinyLean.ast", r.stderr)
+            self.assertNotIn("pyparsing", r.stderr)
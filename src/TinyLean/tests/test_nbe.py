@@ -0,0 +1,109 @@
+from collections import OrderedDict
+from functools import partial
+from unittest import TestCase
+from unittest.mock import patch
+
+from . import assert_same_bodies, check_with, readme
+from .. import ast, ir, nbe, Def, Name, Param
+
+check_nbe = partial(check_with, nbe=True)
+
+
+class TestEvaluator(TestCase):
+    def test_nat(self):
+        text = """
+        def Nat: Type := (T: Type) -> (S: (n: T) -> T) -> (Z: T) -> T
+        def add (a: Nat) (b: Nat): Nat := fun T S Z => (a T S) (b T S Z)
+        def mul (a: Nat) (b: Nat): Nat := fun T S Z => (a T) (b T S) Z
+        def _3: Nat := fun T S Z => S (S (S Z))
+        def _9: Nat := mul _3 _3
+        def _27: Nat := mul _3 _9
+        """
+        *_, _27 = check_nbe(text)
+        assert_same_bodies(self, text, False, check_nbe)
+        self.assertEqual(27, str(_27.body).count("(S "))
+
+    def test_recurse(self):
+        text = """
+        inductive N where
+        | Z
+        | S (n: N)
+        open N
+
+        def add (n: N) (m: N): N :=
+          match n with
+          | Z => m
+          | S pred => S (add pred m)
+
+        def f (n: N) := add (S n) (S Z)
+        example := add (S (S Z)) (S Z)
+        """
+        _, add, f, e = check_nbe(text)
+        self.assertEqual(
+            "match n with | Z ↦ m | S (pred: N) ↦ (N.S ((add pred) m))", str(add.body)
+        )
+        self.assertEqual(
+            "(N.S match n with | Z ↦ (N.S N.Z) | S (pred: N) ↦ (N.S ((add pred) (N.S N.Z))))",
+            str(f.body),
+        )
+        self.assertEqual("(N.S (N.S (N.S N.Z)))", str(e.body))
+
+    def test_literal(self):
+        text = """
+        inductive N where
+        | Z
+        | S (n: N)
+        open N
+
+        def add (n: N) (m: N): N :=
+          match n with
+          | Z => m
+          | S pred => S (add pred m)
+
+        def mul (n: N) (m: N): N :=
+          match n with
+          | Z => Z
+          | S pred => add (mul pred m) m
+
+        def big: N := 1000 * 1000 + 2
+        def pred (n: N): N := match n with | Z => Z | S m => m
+        example: N := pred 3
+        """
+        *_, big, _, e = check_nbe(text)
+        assert isinstance(big, Def)
+        self.assertEqual(ir.Lit, type(big.body))
+        self.assertEqual(1000002, big.body.value)
+        self.assertEqual("(N.S (N.S N.Z))", str(e.body))
+
+    def test_class_failed(self):
+        text = """
+        class C where open C
+        def f [p: C] := Type
+        example := f
+        """
+        with self.assertRaises(ir.NoInstanceError) as e:
+            check_nbe(text)
+        got, loc = e.exception.args
+        self.assertEqual("C", got)
+        self.assertEqual(text.index("C where"), loc)
+
+    def test_readme(self):
+        assert_same_bodies(self, readme(), True, check_nbe)
+
+    def test_conversion(self):
+        text = """
+        def Nat: Type := (T: Type) -> (S: (n: T) -> T) -> (Z: T) -> T
+        def id (T: Type) (x: T): T := x
+        def f: (a: Nat) -> Nat := fun n => id Nat n
+        example: (b: Nat) -> Nat := f
+        """
+        with patch.object(ir.Inliner, "run_with") as run_with:
+            check_nbe(text)
+            run_with.assert_not_called()
+
+    def test_whnf(self):
+        x = Name("x")
+        v = ir.Call(ir.Fn(Param(x, ir.Type(), False), ir.Ref(x)), ir.Type())
+        e = nbe.Evaluator(OrderedDict(), {})
+        self.assertEqual(ir.Type(), e.whnf(v))
+        self.assertIs(v.callee, e.whnf(v.callee))
@@ -0,0 +1,100 @@
+from functools import partial
+from itertools import chain
+from unittest import TestCase
+
+from . import assert_same_bodies, check_with, readme
+from .. import ast, fresh
+from ..ir import Fn, FnType
+
+check_parallel = partial(check_with, jobs=2)
+
+
+class TestParallel(TestCase):
+    def test_dependencies(self):
+        ds = (
+            """
+            class Default (T: Type) where
+                default: T
+            open Default
+
+            inductive N where
+            | Z
+            | S (n: N)
+            open N
+
+            instance: Default N
+            where
+                default := Z
+
+            def one := S Z
+            def two := S one
+            example := default N
+            example := two
+            """
+            | ast.Parser()
+            | ast.NameResolver()
+        )
+        self.assertEqual(
+            [set(), set(), {0, 1}, {1}, {1, 3}, {0, 2, 1}, {4}],
+            ast.dependencies(ds),
+        )
+        self.assertEqual({5, 6}, ast._leaves(ds, ast.dependencies(ds)))
+
+    def test_readme(self):
+        assert_same_bodies(self, readme(), True, check_parallel)
+
+    def test_first_error(self):
+        text = """
+        inductive N where
+        | Z
+        | S (n: N)
+        open N
+
+        example := S Z
+        example: N := Type
+        def f: Type := Z
+        """
+        with self.assertRaises(ast.TypeMismatchError) as e:
+            check_parallel(text)
+        want, got, loc = e.exception.args
+        self.assertEqual(("N", "Type"), (want, got))
+        self.assertEqual(text.index("Type\n        def"), loc)
+
+    def test_unsolved(self):
+        text = """
+        def a := Type
+        example := _
+        """
+        with self.assertRaises(ast.UnsolvedPlaceholderError):
+            check_parallel(text)
+
+    def test_disjoint_ids(self):
+        text = """
+        def id (T: Type) (x: T): T := x
+        example := id Type
+        example := id
+        def after := (T: Type) -> T
+        """
+        ds = check_parallel(text)
+        ids = [list(_ids(d.body)) for d in ds[1:3]]
+        self.assertFalse(set(ids[0]) & set(ids[1]))
+        self.assertGreater(fresh(), max(chain(*ids)))
+
+    def test_unsolved_in_order(self):
+        text = """
+        example := _
+        def u := (x: _) -> Type
+        def v := u
+        """
+        with self.assertRaises(ast.UnsolvedPlaceholderError) as e:
+            check_parallel(text)
+        self.assertEqual(text.index(":= _"), e.exception.args[-1])
+
+
+def _ids(n):
+    if isinstance(n, Fn):
+        yield n.param.name.id
+        yield from _ids(n.body)
+    elif isinstance(n, FnType):
+        yield n.param.name.id
+        yield from chain(_ids(n.param.type), _ids(n.ret))
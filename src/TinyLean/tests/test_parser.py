@@ -1,6 +1,6 @@
 from unittest import TestCase
 
-from pyparsing import ParseException
+from pyparsing import ParseBaseException, ParseException
 
 from . import parse
 from .. import (
@@ -448,3 +448,37 @@ class TestParser(TestCase):
         self.assertEqual("x", x.callee.arg.name.text)
         assert isinstance(x.arg, ast.Ref)
         self.assertEqual("y", x.arg.name.text)
+
+    def test_markdown_blocks(self):
+        text = "x\n```lean\ndef a := Type\n```\n```lean\n```\n```lean\nexample := a\n"
+        self.assertEqual(
+            [(10, 24), (36, 36)],
+            list(ast.blocks(text)),
+        )
+        (a,) = text | ast.Parser(True)
+        self.assertEqual(text.index("a :="), a.loc)
+
+    def test_markdown_blocks_crlf(self):
+        text = "x\r\n```lean\r\ndef a := Type\r\n```\r\n"
+        self.assertEqual([(12, 27)], list(ast.blocks(text)))
+        for backend in ("pyparsing", "pratt"):
+            (a,) = text | ast.Parser(True, backend)
+            self.assertEqual(text.index("a :="), a.loc)
+
+    def test_markdown_block_failed(self):
+        with self.assertRaises(ParseException) as e:
+            list("```lean\ndef a := Type\n)\n```\n" | ast.Parser(True))
+        self.assertEqual(22, e.exception.loc)
+
+    def test_markdown_block_error_location(self):
+        text = "# t\n```lean\ndef a := Type\ndef b := (x: Type) -> \n```"
+        with self.assertRaises(ParseBaseException) as e:
+            list(text | ast.Parser(True))
+        self.assertEqual(49, e.exception.loc)
+        self.assertEqual((5, 1), (e.exception.lineno, e.exception.col))
+
+    def test_markdown_tabs(self):
+        text = "```lean\n\tdef a := Type\n```\n```lean\n\t\texample := a\n```\n"
+        a, e = text | ast.Parser(True)
+        self.assertEqual(text.index("a :="), a.loc)
+        self.assertEqual(text.index("example"), e.loc)
@@ -0,0 +1,88 @@
+import re
+from unittest import TestCase
+
+from . import readme
+from .. import ast, pratt, Def
+
+norm = lambda ds: re.sub(r", id=\d+", "", repr(list(ds)))
+
+PROGRAM = """
+/- comment -/
+inductive N where
+| Z
+| S (n: N)
+open N
+
+class Add (T: Type) where
+    add: (a: T) -> (b: T) -> T
+open Add
+
+instance: Add N
+where
+    add := fun a b => a
+
+def f {T: Type} [p: Add T] (x: T): T := add x (x /- c -/)
+def g (n: N): N :=
+  match n with
+  | Z => Z
+  | S m => λx => nomatch  x
+def h := f (T := N) (S Z) + Z
+example: (a: Type) -> Type := _
+"""
+
+
+class TestPratt(TestCase):
+    def test_same_as_pyparsing(self):
+        self.assertEqual(
+            norm(PROGRAM | ast.Parser()), norm(PROGRAM | ast.Parser(backend="pratt"))
+        )
+
+    def test_infix_chain(self):
+        text = "def x := f 12 - a * 3 * b - 4 + c"
+        self.assertEqual(
+            norm(text | ast.Parser()), norm(text | ast.Parser(backend="pratt"))
+        )
+
+    def test_readme(self):
+        text = readme()
+        self.assertEqual(
+            norm(text | ast.Parser(True)),
+            norm(text | ast.Parser(True, backend="pratt")),
+        )
+
+    def test_infix(self):
+        (d,) = "def a := x + y * z - w" | ast.Parser(backend="pratt")
+        assert isinstance(d, Def)
+        self.assertEqual("((sub ((add x) ((mul y) z))) w)", _show(d.body))
+        self.assertEqual(9, d.body.loc)
+
+    def test_call_newline(self):
+        with self.assertRaises(pratt.ParseError) as e:
+            list("def a := f\n x" | ast.Parser(backend="pratt"))
+        self.assertEqual(12, e.exception.args[1])
+
+    def test_error_loc(self):
+        text = "def a := (a"
+        with self.assertRaises(pratt.ParseError) as e:
+            list(text | ast.Parser(backend="pratt"))
+        self.assertEqual(len(text), e.exception.args[1])
+
+    def test_name_mismatch(self):
+        with self.assertRaises(pratt.ParseError) as e:
+            list("inductive Foo where open Bar" | ast.Parser(backend="pratt"))
+        self.assertEqual(("open and datatype name mismatch", 0), e.exception.args)
+
+    def test_located(self):
+        text = "```lean\ndef a := Type\n```\n\n```lean\n  example := a\n```\n"
+        (s1, a, e1), (s2, b, e2) = ast.Parser(True, backend="pratt").located(text)
+        self.assertEqual(text.index("a :="), a.loc)
+        self.assertEqual(text.index("example"), b.loc)
+        self.assertEqual("def a := Type", text[s1:e1].strip())
+        self.assertEqual("example := a", text[s2:e2].strip())
+
+
+def _show(n: ast.Node) -> str:
+    if isinstance(n, ast.Call):
+        return f"({_show(n.callee)} {_show(n.arg)})"
+    assert isinstance(n, ast.Ref)
+    return n.name.text
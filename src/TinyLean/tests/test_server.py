@@ -0,0 +1,109 @@
+import json
+import socket
+import threading
+from pathlib import Path
+from tempfile import TemporaryDirectory
+from unittest import TestCase, skipUnless
+
+from .. import server
+
+PRELUDE = """
+inductive N where
+| Z
+| S (n: N)
+open N
+
+def two := S (S Z)
+"""
+
+
+class TestServer(TestCase):
+    def test_text(self):
+        s = server.Server()
+        r = s.handle({"text": PRELUDE + "example := two\n"})
+        self.assertEqual(
+            {"ok": True, "diagnostics": [], "reused": 0, "rechecked": 3}, r
+        )
+        r = s.handle({"text": PRELUDE + "example := three\n"})
+        self.assertFalse(r["ok"])
+        (d,) = r["diagnostics"]
+        self.assertEqual(
+            {"file": "<text>", "message": "undefined variable 'three'", "line": 8},
+            {k: d[k] for k in ("file", "message", "line")},
+        )
+        r = s.handle({"text": PRELUDE + "example := S two\n"})
+        self.assertEqual((True, 2, 1), (r["ok"], r["reused"], r["rechecked"]))
+
+    def test_path(self):
+        with TemporaryDirectory() as d:
+            file = Path(d) / "a.md"
+            file.write_text(f"```lean\n{PRELUDE}```\n", encoding="utf-8")
+            s = server.Server()
+            r = s.handle({"path": str(file)})
+            self.assertEqual((True, 2), (r["ok"], r["rechecked"]))
+            r = s.handle({"path": str(Path(d) / "missing.lean")})
+            self.assertFalse(r["ok"])
+
+    def test_syntax_error(self):
+        r = server.Server().handle({"text": "def a := (\n"})
+        self.assertFalse(r["ok"])
+        (d,) = r["diagnostics"]
+        self.assertEqual(2, d["line"])
+
+    def test_evict(self):
+        s = server.Server(capacity=2)
+        for name in "abc":
+            s.handle({"text": PRELUDE, "name": name})
+        s.handle({"text": PRELUDE, "name": "b"})
+        self.assertEqual([("c", False), ("b", False)], list(s.docs))
+
+    @skipUnless(hasattr(socket, "AF_UNIX"), "needs Unix domain sockets")
+    def test_socket(self):
+        with TemporaryDirectory() as d:
+            path = str(Path(d) / "s.sock")
+            with server._UnixServer(path) as srv:
+                t = threading.Thread(target=srv.serve_forever)
+                t.start()
+                try:
+                    with socket.socket(socket.AF_UNIX) as c:
+                        c.connect(path)
+                        with c.makefile("rwb") as f:
+                            for req in ({"text": PRELUDE}, {"bad": 1}):
+                                f.write(json.dumps(req).encode() + b"\n")
+                                f.flush()
+                            ok = json.loads(f.readline())
+                            bad = json.loads(f.readline())
+                finally:
+                    srv.shutdown()
+                    t.join()
+            self.assertTrue(ok["ok"])
+            self.assertIn("bad request", bad["error"])
+
+    @skipUnless(hasattr(socket, "AF_UNIX"), "needs Unix domain sockets")
+    def test_stale_socket(self):
+        with TemporaryDirectory() as d:
+            path = str(Path(d) / "s.sock")
+            with socket.socket(socket.AF_UNIX) as s:
+                s.bind(path)
+            server._unlink_stale(path)
+            self.assertFalse(Path(path).exists())
+
+    @skipUnless(hasattr(socket, "AF_UNIX"), "needs Unix domain sockets")
+    def test_live_socket(self):
+        with TemporaryDirectory() as d:
+            path = str(Path(d) / "s.sock")
+            with socket.socket(socket.AF_UNIX) as s:
+                s.bind(path)
+                s.listen()
+                with self.assertRaises(FileExistsError):
+                    server.serve(path)
+            self.assertTrue(Path(path).exists())
+
+    @skipUnless(hasattr(socket, "AF_UNIX"), "needs Unix domain sockets")
+    def test_not_socket(self):
+        with TemporaryDirectory() as d:
+            path = Path(d) / "a.lean"
+            path.write_text("def a := Type\n")
+            with self.assertRaises(FileExistsError):
+                server.serve(str(path))
+            self.assertEqual("def a := Type\n", path.read_text())
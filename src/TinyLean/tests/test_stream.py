@@ -0,0 +1,48 @@
+from functools import partial
+from unittest import TestCase
+
+from . import assert_same_bodies, readme
+from .. import ast, pratt, Def, Example
+
+
+class TestStream(TestCase):
+    def test_readme(self):
+        checks = (partial(ast.check_stream, backend=b) for b in ("pyparsing", "pratt"))
+        assert_same_bodies(self, readme(), True, *checks)
+
+    def test_lazy(self):
+        text = """
+        inductive N where
+        | Z
+        | S (n: N)
+        open N
+
+        def two := S (S Z)
+        example := two
+        def broken := (
+        """
+        ds = ast.check_stream(text)
+        self.assertIsInstance(next(ds), ast.Data)
+        two = next(ds)
+        assert isinstance(two, Def)
+        self.assertEqual("(N.S (N.S N.Z))", str(two.body))
+        self.assertIsInstance(next(ds), Example)
+        with self.assertRaises(pratt.ParseError):
+            next(ds)
+
+    def test_type_error_first(self):
+        text = """
+        inductive N where
+        | Z
+        open N
+        example: N := Type
+        def broken := (
+        """
+        with self.assertRaises(ast.TypeMismatchError):
+            list(ast.check_stream(text))
+
+    def test_unsolved(self):
+        ds = ast.check_stream("example := _")
+        self.assertIsInstance(next(ds), Example)
+        with self.assertRaises(ast.UnsolvedPlaceholderError):
+            next(ds)